@@ -1,38 +1,148 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Transaction, Account, Bill, Expense, Goal, MainGoal, User
-
-
-class TransactionAdmin(admin.ModelAdmin):
-    list_display = ("title", "amount", "date", "user")
-    list_filter = ("date", "user")
-    search_fields = ("title", "user__username")
-
-
-class AccountAdmin(admin.ModelAdmin):
-    list_display = ("account_type", "account_number", "balance", "user")
-    list_filter = ("account_type", "user")
-    search_fields = ("account_number",)
-
-
-class BillAdmin(admin.ModelAdmin):
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (
+    Account,
+    ArchivedExpense,
+    ArchivedTransaction,
+    Bill,
+    ExchangeRate,
+    Expense,
+    Goal,
+    MainGoal,
+    Transaction,
+    User,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the planner's row estimate instead of COUNT(*) for unfiltered
+    changelists of large PostgreSQL tables.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 (or 0) until the table is analyzed
+            if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class UserFilter(admin.SimpleListFilter):
+    """
+    Filter by user with an autocomplete box instead of a link per user.
+    """
+
+    title = "user"
+    parameter_name = "user"
+    template = "admin/api/user_filter.html"
+
+    def __init__(self, request, params, model, model_admin):
+        self.model = model
+        super().__init__(request, params, model, model_admin)
+
+    def lookups(self, request, model_admin):
+        # Only the selected user is loaded
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        return [(user.pk, user.username) for user in User.objects.filter(pk=value)]
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(user_id=value)
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            "query_string": changelist.get_query_string(remove=[self.parameter_name]),
+            "app_label": self.model._meta.app_label,
+            "model_name": self.model._meta.model_name,
+            "selected": self.lookup_choices,
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelists of per-user tables that stay fast with millions of rows:
+    the user is joined instead of fetched per row, filtered and edited
+    through autocompletes, counted from estimates, and searched through
+    indexes only: ``id:<id>``, ``user:<username>`` or else a case-sensitive
+    prefix of the indexed ``search_fields``.
+    """
+
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        # select2 and the autocomplete script for the user filter
+        widget = AutocompleteSelect(self.model._meta.get_field("user"), self.admin_site)
+        return super().media + widget.media
+
+    def get_search_results(self, request, queryset, search_term):
+        prefix, _, value = search_term.strip().partition(":")
+        if prefix == "id":
+            value = value.strip()
+            if not value.isdigit():
+                return queryset.none(), False
+            return queryset.filter(pk=value), False
+        if prefix == "user":
+            return queryset.filter(user__username=value.strip()), False
+        return super().get_search_results(request, queryset, search_term)
+
+
+class TransactionAdmin(LargeTableAdmin):
+    list_display = ("title", "amount", "currency", "date", "user")
+    list_filter = ("date", UserFilter)
+    search_fields = ("title__startswith",)
+
+
+class AccountAdmin(LargeTableAdmin):
+    list_display = ("account_type", "account_number", "balance", "currency", "user")
+    list_filter = ("account_type", UserFilter)
+    search_fields = ("account_number__startswith",)
+
+
+class BillAdmin(LargeTableAdmin):
     list_display = ("title", "due_date", "amount", "user")
     list_filter = ("due_date",)
-    search_fields = ("title",)
+    search_fields = ("title__startswith",)
 
 
-class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ("title", "category", "amount", "date", "user")
-    list_filter = ("date", "category")
-    search_fields = ("title",)
+class ExpenseAdmin(LargeTableAdmin):
+    list_display = ("title", "category", "amount", "currency", "date", "user")
+    list_filter = ("date", "category", UserFilter)
+    search_fields = ("title__startswith",)
 
 
-class CategoryGoalAdmin(admin.ModelAdmin):
+class CategoryGoalAdmin(LargeTableAdmin):
     list_display = ("category", "target_amount", "user")
-    list_filter = ("category", "user")
-    search_fields = ("category",)
+    list_filter = ("category", UserFilter)
+    search_fields = ("category__exact",)
 
 
-class MainGoalAdmin(admin.ModelAdmin):
+class MainGoalAdmin(LargeTableAdmin):
     list_display = (
         "target_amount",
         "achieved_amount",
@@ -41,18 +151,26 @@ class MainGoalAdmin(admin.ModelAdmin):
         "user",
     )
     list_filter = ("start_date", "end_date")
-    search_fields = ("title",)
 
 
 class UserAdmin(admin.ModelAdmin):
     list_display = ("username", "email", "phone_number")
     search_fields = ("username", "email")
+    ordering = ("username",)
+
+
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ("currency", "rate", "date")
+    list_filter = ("currency",)
 
 
 admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(ArchivedTransaction, TransactionAdmin)
 admin.site.register(Account, AccountAdmin)
 admin.site.register(Bill, BillAdmin)
 admin.site.register(Expense, ExpenseAdmin)
+admin.site.register(ArchivedExpense, ExpenseAdmin)
 admin.site.register(Goal, CategoryGoalAdmin)
 admin.site.register(MainGoal, MainGoalAdmin)
 admin.site.register(User, UserAdmin)
+admin.site.register(ExchangeRate, ExchangeRateAdmin)
@@ -0,0 +1,177 @@
+import math
+from decimal import Decimal
+
+from django.conf import settings
+
+
+def score(statistics, amount):
+    """
+    How many standard deviations ``amount`` lies above the rolling mean of
+    ``statistics``, or None while the category has too little history.
+    """
+    if statistics.count < settings.ANOMALY_MIN_OBSERVATIONS:
+        return None
+    # Perfectly regular spending has no variance, so deviations are measured
+    # against at least a fraction of the mean
+    deviation = max(
+        math.sqrt(statistics.variance),
+        abs(statistics.mean) * settings.ANOMALY_MIN_DEVIATION,
+        0.01,
+    )
+    return round((amount - statistics.mean) / deviation, 2)
+
+
+def update(statistics, amount):
+    """
+    Fold ``amount`` into the exponentially weighted mean and variance.
+    """
+    if statistics.count == 0:
+        statistics.mean, statistics.variance = amount, 0.0
+    else:
+        alpha = settings.ANOMALY_EWMA_ALPHA
+        difference = amount - statistics.mean
+        increment = alpha * difference
+        statistics.mean += increment
+        statistics.variance = (1 - alpha) * (
+            statistics.variance + difference * increment
+        )
+    statistics.count += 1
+
+
+def observe(statistics, amount):
+    """
+    Score ``amount``, in the user's currency, against ``statistics`` and then
+    fold it in. Amounts that could not be converted (None) are not scored.
+    """
+    if amount is None:
+        return None
+    amount = float(amount)
+    result = score(statistics, amount)
+    update(statistics, amount)
+    return result
+
+
+def observe_expense(expense):
+    """
+    Score a new expense against its category's statistics, then update them.
+    Must run in the transaction saving the expense, which holds the row lock.
+    """
+    from .currency import convert
+    from .models import CategoryStatistics
+
+    # Statistics are kept in the user's currency
+    amount = convert(
+        Decimal(expense.amount), expense.currency, expense.user.base_currency
+    )
+    if amount is None:
+        expense.anomaly_score = None
+        return
+    statistics, _ = CategoryStatistics.objects.select_for_update().get_or_create(
+        user_id=expense.user_id, category=expense.category
+    )
+    expense.anomaly_score = observe(statistics, amount)
+    statistics.save(update_fields=["count", "mean", "variance"])
+
+
+def previous_observation(expense):
+    """
+    The stored category, amount and currency of ``expense`` when saving it
+    changes them, otherwise None.
+    """
+    previous = (
+        type(expense)
+        .objects.filter(pk=expense.pk)
+        .values("category", "amount", "currency")
+        .first()
+    )
+    current = {
+        "category": expense.category,
+        "amount": Decimal(str(expense.amount)),
+        "currency": expense.currency,
+    }
+    return previous if previous not in (None, current) else None
+
+
+def rescore_expense(expense, previous):
+    """
+    Score an edited expense against its category's current statistics, and
+    mark the categories it left and joined stale. An observation cannot be
+    taken back out of the rolling statistics, so they are only corrected
+    when rebuild_category_statistics replays the stale categories.
+    """
+    from .currency import convert
+    from .models import CategoryStatistics
+
+    amount = convert(
+        Decimal(expense.amount), expense.currency, expense.user.base_currency
+    )
+    statistics = CategoryStatistics.objects.filter(
+        user_id=expense.user_id, category=expense.category
+    ).first()
+    expense.anomaly_score = (
+        None
+        if amount is None or statistics is None
+        else score(statistics, float(amount))
+    )
+    mark_stale(expense.user_id, {previous["category"], expense.category})
+
+
+def mark_stale(user_id, categories):
+    """
+    Mark the user's statistics of ``categories`` to be replayed, adding
+    them for categories without statistics yet.
+    """
+    from .models import CategoryStatistics
+
+    CategoryStatistics.objects.bulk_create(
+        [
+            CategoryStatistics(user_id=user_id, category=category, stale=True)
+            for category in categories
+        ],
+        ignore_conflicts=True,
+    )
+    CategoryStatistics.objects.filter(user_id=user_id, category__in=categories).update(
+        stale=True
+    )
+
+
+def replay_category(user_id, category):
+    """
+    Recompute a user's statistics for ``category`` and the scores of its
+    expenses by replaying them in the order they were recorded, as
+    rebuild_category_statistics does. Returns the new scores by expense id.
+    """
+    from .currency import convert
+    from .models import CategoryStatistics, Expense
+
+    statistics, _ = CategoryStatistics.objects.select_for_update().get_or_create(
+        user_id=user_id, category=category
+    )
+    statistics.count, statistics.mean, statistics.variance = 0, 0.0, 0.0
+    statistics.stale = False
+    scores = {}
+    expenses = (
+        Expense.objects.filter(user_id=user_id, category=category)
+        .order_by("id")
+        .values_list("id", "amount", "currency", "user__base_currency")
+    )
+    for pk, amount, currency, base_currency in expenses.iterator():
+        scores[pk] = observe(statistics, convert(amount, currency, base_currency))
+    Expense.objects.bulk_update(
+        [Expense(pk=pk, anomaly_score=value) for pk, value in scores.items()],
+        ["anomaly_score"],
+        batch_size=1000,
+    )
+    # Like rebuild_category_statistics, no statistics without an amount
+    if statistics.count:
+        statistics.save(update_fields=["count", "mean", "variance", "stale"])
+    else:
+        statistics.delete()
+    return scores
+
+
+def anomalous(expenses):
+    """
+    Filter an Expense queryset down to the flagged expenses.
+    """
+    return expenses.filter(anomaly_score__gte=settings.ANOMALY_THRESHOLD)
@@ -0,0 +1,84 @@
+import heapq
+import itertools
+import operator
+
+from django.db import transaction
+
+from .models import (
+    ArchivedExpense,
+    ArchivedTransaction,
+    DashboardSnapshot,
+    Expense,
+    Transaction,
+)
+
+ARCHIVES = {Transaction: ArchivedTransaction, Expense: ArchivedExpense}
+
+
+def include_archived(request):
+    """
+    Whether the client asked for archived rows with ``?include_archived=true``.
+    """
+    return request.query_params.get("include_archived", "").lower() in ("1", "true")
+
+
+def user_querysets(user, name, include_archived=False):
+    """
+    The user's ``"transactions"`` or ``"expenses"``, followed by the archived
+    ones when asked for. The dates of the two tables can overlap, through
+    backdated rows or a change of ARCHIVE_AFTER_DAYS, so lists read from both
+    go through newest_first rather than being concatenated.
+    """
+    querysets = [getattr(user, name).all()]
+    if include_archived:
+        querysets.append(getattr(user, f"archived_{name}").all())
+    return querysets
+
+
+def newest_first(values_serializer, querysets, limit=None):
+    """
+    Serialize ``querysets`` with a ValuesSerializer into one list, newest date
+    first, keeping at most ``limit`` rows. On equal dates rows of the main
+    table come before archived ones.
+    """
+    querysets = [queryset.order_by("-date")[:limit] for queryset in querysets]
+    if len(querysets) == 1:
+        return values_serializer.serialize(querysets[0])
+    rows = heapq.merge(
+        *(values_serializer.serialize(queryset, key="date") for queryset in querysets),
+        key=operator.itemgetter(0),
+        reverse=True,
+    )
+    return [row for _, row in itertools.islice(rows, limit)]
+
+
+def archive_rows(model, cutoff, batch_size=1000):
+    """
+    Move rows of ``model`` dated before ``cutoff`` into its archive table,
+    one transaction per batch. Returns the number of rows moved.
+    """
+    archive = ARCHIVES[model]
+    fields = [field.attname for field in archive._meta.concrete_fields]
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                model.objects.select_for_update()
+                .filter(date__lt=cutoff)
+                .order_by("pk")
+                .values(*fields)[:batch_size]
+            )
+            if not rows:
+                return moved
+            archive.objects.bulk_create(archive(**row) for row in rows)
+            # A plain DELETE, without the per-row delete signals. Snapshots
+            # may still count the archived expenses, so those of their users
+            # are dropped here instead
+            model.objects.filter(pk__in=[row["id"] for row in rows])._raw_delete(
+                model.objects.db
+            )
+            if model is Expense:
+                DashboardSnapshot.objects.filter(
+                    user_id__in={row["user_id"] for row in rows}
+                ).delete()
+        moved += len(rows)
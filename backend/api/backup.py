@@ -0,0 +1,521 @@
+import gzip
+import io
+import json
+import struct
+import sys
+from array import array
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import (
+    DataError,
+    IntegrityError,
+    connections,
+    models,
+    router,
+    transaction,
+)
+from django.utils import timezone
+
+from .anomalies import observe
+from .currency import convert
+
+from .models import (
+    Account,
+    ArchivedExpense,
+    ArchivedTransaction,
+    Bill,
+    CategoryStatistics,
+    DashboardSnapshot,
+    Expense,
+    Goal,
+    MainGoal,
+    Transaction,
+    User,
+)
+
+# An archive is a gzip stream holding a header and a sequence of frames:
+#
+#   header: b"SSBK" | version (u8) | manifest length (u32) | manifest (JSON)
+#   frame:  model index (u16) | row count (u32) | one block per column
+#   end:    0xFFFF (u16)
+#
+# The manifest has the profile and, per model, its columns as
+# [name, type, nullable]. A block is its length (u32), a null mask for
+# nullable columns, then the values: little-endian int64 for integers,
+# decimals scaled by their decimal places and datetimes in microseconds
+# since the epoch, int32 day ordinals for dates, float64, a byte per
+# boolean, and int32 lengths followed by UTF-8 for strings and JSON.
+MAGIC = b"SSBK"
+VERSION = 1
+END = 0xFFFF
+
+# Category statistics and anomaly scores are derived from the expenses, so
+# they are recomputed on restore instead of being backed up
+BACKUP_MODELS = [
+    Account,
+    Bill,
+    Transaction,
+    ArchivedTransaction,
+    Expense,
+    ArchivedExpense,
+    Goal,
+    MainGoal,
+]
+PROFILE_FIELDS = [
+    "email",
+    "first_name",
+    "last_name",
+    "phone_number",
+    "base_currency",
+]
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Bytes per value of fixed-size column types
+VALUE_SIZES = {"int": 8, "datetime": 8, "date": 4, "float": 8, "bool": 1}
+# Most bytes of a restored string without a max_length
+MAX_TEXT_BYTES = 65536
+
+# The rules of the API serializers that do not depend on the day, checked on
+# restored rows: columns that cannot be negative or empty, and pairs of
+# columns where the first cannot exceed the second
+NOT_NEGATIVE = ["amount", "balance", "target_amount", "achieved_amount"]
+NOT_EMPTY = ["title", "account_number", "organization_name"]
+NOT_ABOVE = [("start_date", "end_date"), ("achieved_amount", "target_amount")]
+
+
+class BackupError(Exception):
+    pass
+
+
+def column_type(field):
+    if isinstance(field, models.DecimalField):
+        return f"decimal:{field.decimal_places}"
+    if isinstance(field, models.DateTimeField):
+        return "datetime"
+    if isinstance(field, models.DateField):
+        return "date"
+    if isinstance(field, models.BooleanField):
+        return "bool"
+    if isinstance(field, models.FloatField):
+        return "float"
+    if isinstance(field, (models.IntegerField, models.ForeignKey)):
+        return "int"
+    if isinstance(field, models.JSONField):
+        return "json"
+    return "str"
+
+
+def backup_columns(model):
+    """
+    ``(field, type, nullable)`` of the columns backed up for ``model``: all
+    editable concrete fields but the primary key and the user.
+    """
+    return [
+        (field, column_type(field), field.null)
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name != "user" and field.editable
+    ]
+
+
+def little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_column(kind, values):
+    if kind.startswith("decimal:"):
+        places = int(kind.partition(":")[2])
+        return little_endian(
+            array("q", [int(value.scaleb(places)) for value in values])
+        ).tobytes()
+    if kind == "int":
+        return little_endian(array("q", values)).tobytes()
+    if kind == "datetime":
+        return little_endian(
+            array(
+                "q", [(value - EPOCH) // timedelta(microseconds=1) for value in values]
+            )
+        ).tobytes()
+    if kind == "date":
+        return little_endian(
+            array("i", [value.toordinal() for value in values])
+        ).tobytes()
+    if kind == "float":
+        return little_endian(array("d", values)).tobytes()
+    if kind == "bool":
+        return bytes(values)
+    if kind == "json":
+        values = [json.dumps(value) for value in values]
+    encoded = [value.encode() for value in values]
+    lengths = little_endian(array("i", [len(value) for value in encoded]))
+    return lengths.tobytes() + b"".join(encoded)
+
+
+def decode_column(kind, data, count):
+    def numbers(typecode, size):
+        values = array(typecode)
+        values.frombytes(data[: count * size])
+        return little_endian(values)
+
+    if kind.startswith("decimal:"):
+        places = -int(kind.partition(":")[2])
+        return [Decimal(value).scaleb(places) for value in numbers("q", 8)]
+    if kind == "int":
+        return numbers("q", 8).tolist()
+    if kind == "datetime":
+        return [EPOCH + timedelta(microseconds=value) for value in numbers("q", 8)]
+    if kind == "date":
+        return [date.fromordinal(value) for value in numbers("i", 4)]
+    if kind == "float":
+        return numbers("d", 8).tolist()
+    if kind == "bool":
+        return [bool(value) for value in data[:count]]
+
+    lengths, values, offset = numbers("i", 4), [], count * 4
+    if min(lengths, default=0) < 0 or offset + sum(lengths) != len(data):
+        raise BackupError("A string column does not match its lengths.")
+    for length in lengths:
+        values.append(data[offset : offset + length].decode())
+        offset += length
+    if kind == "json":
+        values = [json.loads(value) for value in values]
+    return values
+
+
+# Placeholders for nulls, replaced by the null mask on restore
+NULL_VALUES = {
+    "int": 0,
+    "datetime": EPOCH,
+    "date": date(1970, 1, 1),
+    "float": 0.0,
+    "bool": False,
+    "str": "",
+    "json": None,
+}
+
+
+def encode_frame(index, columns, rows):
+    parts = [struct.pack("<HI", index, len(rows))]
+    for position, (_, kind, nullable) in enumerate(columns):
+        values = [row[position] for row in rows]
+        block = b""
+        if nullable:
+            nulls = [value is None for value in values]
+            placeholder = NULL_VALUES.get(kind, Decimal(0))
+            values = [
+                placeholder if null else value for null, value in zip(nulls, values)
+            ]
+            block = bytes(nulls)
+        block += encode_column(kind, values)
+        parts += [struct.pack("<I", len(block)), block]
+    return b"".join(parts)
+
+
+def archive_frames(user, batch_size):
+    manifest = {
+        "created": timezone.now().isoformat(),
+        "profile": {field: getattr(user, field) for field in PROFILE_FIELDS},
+        "models": [
+            [
+                model._meta.label,
+                [
+                    [field.name, kind, nullable]
+                    for field, kind, nullable in backup_columns(model)
+                ],
+            ]
+            for model in BACKUP_MODELS
+        ],
+    }
+    manifest = json.dumps(manifest).encode()
+    yield MAGIC + struct.pack("<BI", VERSION, len(manifest)) + manifest
+
+    for index, model in enumerate(BACKUP_MODELS):
+        columns = backup_columns(model)
+        rows = (
+            model.objects.filter(user=user)
+            .order_by("pk")
+            .values_list(*(field.attname for field, _, _ in columns))
+            .iterator(chunk_size=batch_size)
+        )
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield encode_frame(index, columns, batch)
+                batch = []
+        if batch:
+            yield encode_frame(index, columns, batch)
+    yield struct.pack("<H", END)
+
+
+def backup_chunks(user, batch_size=None):
+    """
+    The user's backup archive as a stream of compressed chunks, one batch
+    of rows at a time. Batches are at most BACKUP_BATCH_SIZE rows, the most
+    a restore accepts.
+    """
+    batch_size = min(
+        batch_size or settings.BACKUP_BATCH_SIZE, settings.BACKUP_BATCH_SIZE
+    )
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6) as archive:
+        for frame in archive_frames(user, batch_size):
+            archive.write(frame)
+            if buffer.tell():
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    yield buffer.getvalue()
+
+
+def read_exactly(file, size):
+    data = file.read(size)
+    if len(data) != size:
+        raise BackupError("The backup is truncated.")
+    return data
+
+
+def restore_backup(user, file, progress=None):
+    """
+    Replace the user's data and profile with the backup read from ``file``,
+    in one transaction, inserting a batch of rows per frame. Returns the
+    number of rows restored per model label.
+    """
+    try:
+        archive = gzip.GzipFile(fileobj=file, mode="rb")
+        if archive.read(len(MAGIC)) != MAGIC:
+            raise BackupError("Not a backup archive.")
+        version, length = struct.unpack("<BI", read_exactly(archive, 5))
+        if version > VERSION:
+            raise BackupError(f"Unsupported backup version {version}.")
+        manifest = json.loads(read_exactly(archive, length))
+        with transaction.atomic():
+            return restore_frames(user, archive, manifest, progress)
+    except (
+        OSError,
+        EOFError,
+        ValueError,
+        LookupError,
+        OverflowError,
+        struct.error,
+        IntegrityError,
+        DataError,
+    ) as error:
+        raise BackupError(f"Invalid backup: {error}") from error
+
+
+def restore_plan(manifest):
+    """
+    ``(model, [(field, type, nullable)])`` for each model of the manifest.
+    Models and columns unknown to this version have no model or field and
+    are skipped, columns missing from the backup get their defaults.
+    """
+    models_by_label = {model._meta.label: model for model in BACKUP_MODELS}
+    plan = []
+    for label, columns in manifest["models"]:
+        model = models_by_label.get(label)
+        fields = {}
+        if model is not None:
+            fields = {field.name: field for field, _, _ in backup_columns(model)}
+        for name, kind, _ in columns:
+            if name in fields and kind != column_type(fields[name]):
+                raise BackupError(f"{label}.{name} cannot be restored from {kind}.")
+        plan.append(
+            (
+                model,
+                [
+                    (fields.get(name), kind, nullable)
+                    for name, kind, nullable in columns
+                ],
+            )
+        )
+    return plan
+
+
+def block_bounds(field, kind, nullable, count):
+    """
+    The least and most bytes of the block of ``count`` values of a column.
+    """
+    mask = count if nullable else 0
+    if kind in VALUE_SIZES or kind.startswith("decimal:"):
+        size = mask + count * VALUE_SIZES.get(kind, 8)
+        return size, size
+    max_length = getattr(field, "max_length", None)
+    # UTF-8 takes up to 4 bytes per character
+    most = 4 * max_length if max_length else MAX_TEXT_BYTES
+    return mask + count * 4, mask + count * (4 + most)
+
+
+def check_column(field, column):
+    """
+    Raise BackupError unless every value of ``column`` is valid for
+    ``field``: not null unless allowed, one of its choices, and passing its
+    validators such as max_length and max_digits.
+    """
+    choices = {choice for choice, _ in field.flatchoices} if field.choices else None
+    for value in column:
+        if value is None:
+            if not field.null:
+                raise BackupError(f"{field} cannot be null.")
+            continue
+        if choices is not None and value not in choices:
+            raise BackupError(f"{field} has an invalid choice {value!r}.")
+        try:
+            field.run_validators(value)
+        except ValidationError as error:
+            raise BackupError(f"{field}: {' '.join(error.messages)}") from error
+
+
+def check_rows(model, values):
+    """
+    Raise BackupError unless the rows, given as ``{attname: column}``,
+    follow the rules of the API serializers, see NOT_NEGATIVE.
+    """
+    for name in NOT_NEGATIVE:
+        if any(value is not None and value < 0 for value in values.get(name, ())):
+            raise BackupError(f"{model._meta.label}.{name} cannot be negative.")
+    for name in NOT_EMPTY:
+        if name in values and not all(values[name]):
+            raise BackupError(f"{model._meta.label}.{name} cannot be empty.")
+    for low, high in NOT_ABOVE:
+        if low in values and high in values:
+            pairs = zip(values[low], values[high])
+            if any(a is not None and b is not None and a > b for a, b in pairs):
+                raise BackupError(f"{model._meta.label}.{low} cannot be above {high}.")
+
+
+def adapt_column(field, column, connection):
+    # Values of these fields are passed to the database driver as they are
+    if isinstance(
+        field,
+        (
+            models.CharField,
+            models.TextField,
+            models.IntegerField,
+            models.FloatField,
+            models.BooleanField,
+            models.ForeignKey,
+        ),
+    ):
+        return column
+    return [field.get_db_prep_save(value, connection) for value in column]
+
+
+def insert_rows(model, values):
+    """
+    Insert rows given as ``{attname: column}`` for every concrete field but
+    the primary key, with multi-row INSERT statements of the columns adapted
+    at once. This is the same SQL as bulk_create without building a model
+    instance and compiling every value of the batch, which is most of its
+    cost.
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = [
+        adapt_column(field, values[field.attname], connection) for field in fields
+    ]
+    rows = list(zip(*columns))
+
+    quote = connection.ops.quote_name
+    statement = "INSERT INTO {} ({}) VALUES ".format(
+        quote(model._meta.db_table), ", ".join(quote(field.column) for field in fields)
+    )
+    placeholders = "({})".format(", ".join(["%s"] * len(fields)))
+    max_params = connection.features.max_query_params or 65535
+    per_statement = max(1, max_params // len(fields))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), per_statement):
+            batch = rows[start : start + per_statement]
+            cursor.execute(
+                statement + ", ".join([placeholders] * len(batch)),
+                [value for row in batch for value in row],
+            )
+
+
+def restore_frames(user, archive, manifest, progress):
+    plan = restore_plan(manifest)
+    profile = {
+        field: value
+        for field, value in manifest["profile"].items()
+        if field in PROFILE_FIELDS
+    }
+    for name, value in profile.items():
+        if not isinstance(value, (str, type(None))):
+            raise BackupError(f"The profile's {name} is not a string.")
+        check_column(User._meta.get_field(name), [value])
+    User.objects.filter(pk=user.pk).update(**profile)
+    base_currency = profile.get("base_currency", user.base_currency)
+    DashboardSnapshot.objects.filter(user=user).delete()
+    # Nothing references these tables, and the restore is a single
+    # transaction anyway, so one DELETE per table does
+    for model in BACKUP_MODELS + [CategoryStatistics]:
+        queryset = model.objects.filter(user=user)
+        queryset._raw_delete(queryset.db)
+
+    counts = {model._meta.label: 0 for model in BACKUP_MODELS}
+    statistics = {}
+    while True:
+        (index,) = struct.unpack("<H", read_exactly(archive, 2))
+        if index == END:
+            break
+        (count,) = struct.unpack("<I", read_exactly(archive, 4))
+        # Backups are written in frames of at most this many rows, see
+        # backup_chunks, so a larger count is not a real backup
+        if count > settings.BACKUP_BATCH_SIZE:
+            raise BackupError(
+                f"A frame has more than {settings.BACKUP_BATCH_SIZE} rows."
+            )
+        model, columns = plan[index]
+        values = {}
+        for field, kind, nullable in columns:
+            (length,) = struct.unpack("<I", read_exactly(archive, 4))
+            least, most = block_bounds(field, kind, nullable, count)
+            if not least <= length <= most:
+                raise BackupError("A column does not match its row count.")
+            block = read_exactly(archive, length)
+            if field is None:
+                continue
+            nulls = block[:count] if nullable else None
+            column = decode_column(kind, block[count:] if nullable else block, count)
+            if nulls:
+                column = [None if null else value for null, value in zip(nulls, column)]
+            check_column(field, column)
+            values[field.attname] = column
+        if model is None:
+            continue
+        for field in model._meta.concrete_fields:
+            if not field.primary_key and field.attname not in values:
+                values[field.attname] = [field.get_default()] * count
+        values["user_id"] = [user.pk] * count
+        check_rows(model, values)
+        if model is Expense:
+            values["anomaly_score"] = score_expenses(
+                user, statistics, values, base_currency
+            )
+        insert_rows(model, values)
+        counts[model._meta.label] += count
+        if progress is not None:
+            progress(model, counts[model._meta.label])
+
+    CategoryStatistics.objects.bulk_create(statistics.values())
+    return counts
+
+
+def score_expenses(user, statistics, values, base_currency):
+    """
+    Anomaly scores of restored expenses, folding them into the user's
+    ``{category: CategoryStatistics}`` in the order they were recorded, as
+    rebuild_category_statistics does.
+    """
+    scores = []
+    for category, amount, currency in zip(
+        values["category"], values["amount"], values["currency"]
+    ):
+        amount = convert(amount, currency, base_currency)
+        if amount is not None and category not in statistics:
+            statistics[category] = CategoryStatistics(user=user, category=category)
+        scores.append(observe(statistics.get(category), amount))
+    return scores
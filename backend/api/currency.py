@@ -0,0 +1,114 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
+
+from .models import ExchangeRate, currency_choices
+
+rates = None
+rates_loaded_at = 0
+rates_lock = threading.Lock()
+
+
+def exchange_rates():
+    """
+    Latest value of one unit of every currency in FX_REFERENCE_CURRENCY,
+    memoized per process for FX_RATES_CACHE_SECONDS.
+    """
+    global rates, rates_loaded_at
+    with rates_lock:
+        if rates is None or time.monotonic() - rates_loaded_at > (
+            settings.FX_RATES_CACHE_SECONDS
+        ):
+            latest = {}
+            for currency, rate in ExchangeRate.objects.order_by(
+                "currency", "date"
+            ).values_list("currency", "rate"):
+                latest[currency] = rate
+            latest[settings.FX_REFERENCE_CURRENCY] = Decimal(1)
+            rates, rates_loaded_at = latest, time.monotonic()
+        return rates
+
+
+def clear_exchange_rates():
+    global rates
+    with rates_lock:
+        rates = None
+
+
+def exchange_rate(from_currency, to_currency):
+    """
+    Units of ``to_currency`` per unit of ``from_currency``, or None without
+    rates for both.
+    """
+    if from_currency == to_currency:
+        return Decimal(1)
+    current = exchange_rates()
+    if from_currency not in current or to_currency not in current:
+        return None
+    return current[from_currency] / current[to_currency]
+
+
+def convert(amount, from_currency, to_currency):
+    rate = exchange_rate(from_currency, to_currency)
+    return None if rate is None else amount * rate
+
+
+def unconverted_currencies(querysets, to_currency, currency_field="currency"):
+    """
+    The currencies of rows in ``querysets`` without a rate into
+    ``to_currency``, sorted. Their amounts are left out of the sums of
+    ``converted``, so responses list them next to the totals. No query is
+    run when every currency has a rate.
+    """
+    missing = [
+        currency
+        for currency, _ in currency_choices
+        if exchange_rate(currency, to_currency) is None
+    ]
+    if not missing:
+        return []
+    found = set()
+    for queryset in querysets:
+        found.update(
+            queryset.filter(**{f"{currency_field}__in": missing})
+            .order_by()
+            .values_list(currency_field, flat=True)
+            .distinct()
+        )
+    return sorted(found)
+
+
+def converted(amount_field, to_currency, currency_field="currency"):
+    """
+    Expression for ``amount_field`` converted into ``to_currency``, to be
+    aggregated in the database, e.g. ``Sum(converted("amount", "USD"))``.
+
+    ``to_currency`` is a currency code or a lookup such as
+    ``"user__base_currency"`` to convert each row into its own target.
+    Amounts without a rate are NULL and so left out of sums.
+    """
+    currencies = [currency for currency, _ in currency_choices]
+    if to_currency in currencies:
+        pairs = [
+            ({currency_field: source}, source, to_currency) for source in currencies
+        ]
+    else:
+        pairs = [
+            ({currency_field: source, to_currency: target}, source, target)
+            for source in currencies
+            for target in currencies
+        ]
+
+    whens = []
+    for condition, source, target in pairs:
+        rate = exchange_rate(source, target)
+        if rate is not None:
+            whens.append(When(**condition, then=Value(rate)))
+    factor = Case(*whens, output_field=DecimalField(max_digits=30, decimal_places=15))
+    return ExpressionWrapper(
+        F(amount_field) * factor,
+        output_field=DecimalField(max_digits=20, decimal_places=2),
+    )
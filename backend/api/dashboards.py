@@ -0,0 +1,257 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .currency import converted
+from .models import ArchivedExpense, DashboardSnapshot, Expense, Goal, category_choices
+from .timeseries import add_series, by_year_and_month, empty_series, grouped_time_series
+
+CATEGORIES = [category for category, _ in category_choices]
+
+
+def chart_years(today):
+    return [today.year - 1, today.year]
+
+
+def month_starts(today):
+    """
+    First days of last, the current and next month.
+    """
+    current = today.replace(day=1)
+    last = (current - timedelta(days=1)).replace(day=1)
+    following = (current + timedelta(days=31)).replace(day=1)
+    return last, current, following
+
+
+def compute_chart_data(user_ids, today, before=None, include_archived=False):
+    """
+    The heavy parts of the dashboard of many users, in three set-based
+    queries: ``{user_id: {"expenses": series, "goals": series,
+    "current_month": {category: total}, "last_month": {category: total}}}``.
+
+    With ``before``, expenses dated on or after that day are left out so
+    they can be merged in later. With ``include_archived``, the expense
+    queries are run on the archive table too.
+    """
+    years = chart_years(today)
+    last_start, current_start, next_start = month_starts(today)
+    # Each user's expenses are converted into their own currency
+    amount = converted("amount", "user__base_currency")
+    expense_series = {}
+    category_totals = []
+    for model in [Expense, ArchivedExpense] if include_archived else [Expense]:
+        expenses = model.objects.filter(user_id__in=user_ids)
+        if before is not None:
+            expenses = expenses.filter(date__lt=before)
+        for user_id, series in grouped_time_series(
+            expenses, "user_id", "date", {"total": Sum(amount)}, years
+        ).items():
+            if user_id in expense_series:
+                add_series(expense_series[user_id], series)
+            else:
+                expense_series[user_id] = series
+        category_totals += (
+            expenses.filter(date__gte=last_start, date__lt=next_start)
+            .order_by()
+            .values("user_id", "category")
+            .annotate(
+                current=Sum(amount, filter=Q(date__gte=current_start)),
+                last=Sum(amount, filter=Q(date__lt=current_start)),
+            )
+        )
+    goal_series = grouped_time_series(
+        Goal.objects.filter(user_id__in=user_ids),
+        "user_id",
+        "start_date",
+        {"total_achieved": Sum("achieved_amount")},
+        years,
+    )
+
+    data = {}
+    for user_id in user_ids:
+        expenses_of_user = expense_series.get(user_id) or empty_series(["total"], years)
+        goals_of_user = goal_series.get(user_id) or empty_series(
+            ["total_achieved"], years
+        )
+        data[user_id] = {
+            "expenses": expenses_of_user["total"],
+            "goals": goals_of_user["total_achieved"],
+            "current_month": {},
+            "last_month": {},
+        }
+    for row in category_totals:
+        for month in ["current", "last"]:
+            if row[month] is not None:
+                totals = data[row["user_id"]][f"{month}_month"]
+                totals[row["category"]] = totals.get(row["category"], 0) + row[month]
+    return data
+
+
+def merge_expenses(chart_data, user, today, since):
+    """
+    Add the user's expenses dated on or after ``since`` to ``chart_data``.
+    """
+    last_start, current_start, _ = month_starts(today)
+    rows = (
+        Expense.objects.filter(user=user, date__gte=since, date__year__lte=today.year)
+        .order_by()
+        .values("category", month=TruncMonth("date", output_field=DateField()))
+        .annotate(total=Sum(converted("amount", user.base_currency)))
+    )
+    for row in rows:
+        if row["total"] is None:
+            continue
+        series, month = chart_data["expenses"], row["month"]
+        if month in series:
+            series[month] += row["total"]
+        totals = {current_start: "current_month", last_start: "last_month"}.get(month)
+        if totals:
+            category = row["category"]
+            chart_data[totals][category] = (
+                chart_data[totals].get(category, 0) + row["total"]
+            )
+    return chart_data
+
+
+def dump_chart_data(chart_data):
+    return {
+        "expenses": {str(k): str(v) for k, v in chart_data["expenses"].items()},
+        "goals": {str(k): str(v) for k, v in chart_data["goals"].items()},
+        "current_month": {k: str(v) for k, v in chart_data["current_month"].items()},
+        "last_month": {k: str(v) for k, v in chart_data["last_month"].items()},
+    }
+
+
+def load_chart_data(data):
+    def number(value):
+        # Keep the int 0 of empty buckets, as computed live
+        return 0 if value == "0" else Decimal(value)
+
+    return {
+        "expenses": {
+            date.fromisoformat(k): number(v) for k, v in data["expenses"].items()
+        },
+        "goals": {date.fromisoformat(k): number(v) for k, v in data["goals"].items()},
+        "current_month": {k: Decimal(v) for k, v in data["current_month"].items()},
+        "last_month": {k: Decimal(v) for k, v in data["last_month"].items()},
+    }
+
+
+def store_snapshots(user_ids, as_of):
+    """
+    Compute and store the snapshots of ``user_ids``, covering data dated
+    before ``as_of``. Returns the number of snapshots written.
+    """
+    data = compute_chart_data(user_ids, as_of, before=as_of)
+    snapshots = [
+        DashboardSnapshot(
+            user_id=user_id, as_of=as_of, data=dump_chart_data(chart_data)
+        )
+        for user_id, chart_data in data.items()
+    ]
+    DashboardSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=["user"],
+        update_fields=["as_of", "data", "computed_at"],
+    )
+    return len(snapshots)
+
+
+def chart_data(user, today, include_archived=False):
+    """
+    The user's snapshot with today's expenses merged in, when one was
+    computed earlier this month, otherwise computed from scratch. Snapshots
+    leave archived expenses out, so those are always computed from scratch.
+    """
+    if include_archived:
+        return compute_chart_data([user.pk], today, include_archived=True)[user.pk]
+    snapshot = (
+        DashboardSnapshot.objects.filter(
+            user=user, as_of__lte=today, as_of__gte=today.replace(day=1)
+        )
+        .only("as_of", "data")
+        .first()
+    )
+    if snapshot is None:
+        return compute_chart_data([user.pk], today)[user.pk]
+    return merge_expenses(load_chart_data(snapshot.data), user, today, snapshot.as_of)
+
+
+def categorized_expense(category, current_total, last_total):
+    # Percentage change of the category since last month
+    percentage_change = (
+        ((current_total - last_total) / last_total) * 100
+        if last_total > 0
+        else (100 if current_total > 0 else 0)
+    )
+    return {
+        "category": category,
+        "current_month_total": current_total,
+        "last_month_total": last_total,
+        "percentage_change": round(percentage_change, 2),
+    }
+
+
+def category_totals(user_id, today, categories=CATEGORIES, include_archived=False):
+    """
+    The ``categorized_expenses`` entries of the dashboard for ``categories``
+    only, computed live.
+    """
+    last_start, current_start, next_start = month_starts(today)
+    amount = converted("amount", "user__base_currency")
+    totals = {}
+    for model in [Expense, ArchivedExpense] if include_archived else [Expense]:
+        rows = (
+            model.objects.filter(
+                user_id=user_id,
+                category__in=categories,
+                date__gte=last_start,
+                date__lt=next_start,
+            )
+            .order_by()
+            .values("category")
+            .annotate(
+                current=Sum(amount, filter=Q(date__gte=current_start)),
+                last=Sum(amount, filter=Q(date__lt=current_start)),
+            )
+        )
+        for row in rows:
+            for month in ["current", "last"]:
+                if row[month] is not None:
+                    key = row["category"], month
+                    totals[key] = totals.get(key, 0) + row[month]
+    return [
+        categorized_expense(
+            category,
+            totals.get((category, "current"), 0),
+            totals.get((category, "last"), 0),
+        )
+        for category in categories
+    ]
+
+
+def dashboard_charts(user, today, include_archived=False):
+    """
+    The ``monthly_expenses``, ``monthly_goals`` and ``categorized_expenses``
+    fields of the dashboard.
+    """
+    data = chart_data(user, today, include_archived)
+    years = chart_years(today)
+
+    categorized_expenses = [
+        categorized_expense(
+            category,
+            data["current_month"].get(category, 0),
+            data["last_month"].get(category, 0),
+        )
+        for category in CATEGORIES
+    ]
+
+    return {
+        "monthly_expenses": by_year_and_month(data["expenses"], years),
+        "monthly_goals": by_year_and_month(data["goals"], years),
+        "categorized_expenses": categorized_expenses,
+    }
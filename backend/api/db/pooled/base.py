@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.db.utils import load_backend
+
+from api.pool import PooledDatabaseWrapperMixin
+
+# The backend being pooled, e.g. django.db.backends.postgresql
+backend = load_backend(settings.DB_POOL_ENGINE)
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, backend.DatabaseWrapper):
+    pass
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.views import View
+
+
+def swagger_auto_schema(**kwargs):
+    """
+    drf_yasg's ``swagger_auto_schema`` when API_DOCS is enabled, otherwise a
+    no-op, so views can be documented without importing drf_yasg.
+    """
+    if settings.API_DOCS:
+        from drf_yasg.utils import swagger_auto_schema
+
+        return swagger_auto_schema(**kwargs)
+    return lambda view: view
+
+
+def get_api_info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="SpendSMART API",
+        default_version="v1",
+        description="SpendSMART API documentation",
+    )
+
+
+def get_schema_view():
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    return get_schema_view(
+        get_api_info(),
+        public=True,
+        permission_classes=(permissions.AllowAny,),
+    )
+
+
+schema = None
+schema_lock = threading.Lock()
+
+
+def load_schema():
+    """
+    The schema artifact written by build_api_schema and its ETag, read once
+    per process and again only when the file changes.
+    """
+    global schema
+    try:
+        modified = os.stat(settings.API_SCHEMA_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with schema_lock:
+        if schema is None or schema[0] != modified:
+            with open(settings.API_SCHEMA_PATH, "rb") as file:
+                content = file.read()
+            etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+            schema = (modified, content, etag)
+        return schema[1:]
+
+
+class StaticSchemaView(View):
+    """
+    Serves the prebuilt OpenAPI schema with long-lived caching.
+    """
+
+    def get(self, request):
+        loaded = load_schema()
+        if loaded is None:
+            raise Http404("The API schema has not been built.")
+        content, etag = loaded
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type="application/json")
+        response["ETag"] = etag
+        patch_cache_control(response, public=True, max_age=settings.API_SCHEMA_MAX_AGE)
+        return response
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import User
+from .renderers import FastJSONRenderer
+
+TICKET_SALT = "api.events.ticket"
+
+
+class Subscription:
+    """
+    Events for one connected client, queued on the event loop serving it.
+    """
+
+    __slots__ = ("broker", "user_id", "loop", "queue")
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+
+    def put(self, event):
+        if self.queue.full():
+            # A client this far behind refetches the dashboard instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {"type": "reset"}
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        """
+        The next event, or None after ``timeout`` seconds without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Delivers events to the subscribers connected to this process.
+
+    Clients of other workers only see the events published there, so
+    deployments with several workers set EVENTS_BROKER to a shared backend
+    with the same ``subscribe``, ``unsubscribe``, ``has_subscribers`` and
+    ``publish`` methods.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def has_subscribers(self, user_id):
+        return user_id in self.subscriptions
+
+    def publish(self, user_id, event):
+        # Called from any thread, the queues belong to the event loops
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The loop is closed
+                self.unsubscribe(subscription)
+
+
+broker = None
+broker_lock = threading.Lock()
+
+
+def get_broker():
+    global broker
+    with broker_lock:
+        if broker is None:
+            broker = import_string(settings.EVENTS_BROKER)()
+        return broker
+
+
+def publish(user_id, build_event):
+    """
+    Publish ``build_event()`` to the user's subscribers once the current
+    transaction commits. The event is only built when someone listens.
+    """
+
+    def send():
+        current = get_broker()
+        if current.has_subscribers(user_id):
+            current.publish(user_id, build_event())
+
+    transaction.on_commit(send)
+
+
+def format_event(event):
+    """
+    Encode an event as a Server-Sent Events message.
+    """
+    data = FastJSONRenderer().render(event)
+    return b"event: " + event["type"].encode() + b"\ndata: " + data + b"\n\n"
+
+
+def token_user(key):
+    """
+    The active user of the token ``key``, or None. The database connection
+    is closed afterwards so that open streams do not hold connections.
+    """
+    try:
+        return TokenAuthentication().authenticate_credentials(key)[0]
+    except AuthenticationFailed:
+        return None
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+def issue_ticket(user):
+    """
+    A signed ticket opening the user's event stream for
+    EVENTS_TICKET_SECONDS, to pass as ``?ticket=`` where headers cannot be
+    set, so that the API token stays out of URLs and access logs.
+    """
+    return signing.dumps(user.pk, salt=TICKET_SALT)
+
+
+def ticket_user(ticket):
+    """
+    The active user of an unexpired ``ticket``, or None. Closes the database
+    connection like ``token_user``.
+    """
+    try:
+        user_id = signing.loads(
+            ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_SECONDS
+        )
+    except signing.BadSignature:
+        return None
+    try:
+        return User.objects.filter(pk=user_id, is_active=True).first()
+    finally:
+        if not connection.in_atomic_block:
+            connection.close()
+
+
+async def event_stream(subscription):
+    """
+    The subscription's events as Server-Sent Events, with a comment as
+    heartbeat every EVENTS_HEARTBEAT_SECONDS while idle.
+
+    The stream ends after EVENTS_STREAM_SECONDS and the client reconnects,
+    which bounds the life of subscriptions whose client left unnoticed.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EVENTS_STREAM_SECONDS
+    try:
+        yield b"retry: 3000\n\n"
+        while (remaining := deadline - loop.time()) > 0:
+            event = await subscription.get(
+                min(settings.EVENTS_HEARTBEAT_SECONDS, remaining)
+            )
+            yield b": heartbeat\n\n" if event is None else format_event(event)
+    finally:
+        subscription.close()
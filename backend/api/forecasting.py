@@ -0,0 +1,222 @@
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .archive import user_querysets
+from .currency import converted
+
+
+def month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index):
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def fit(first_month, values):
+    """
+    Fit a linear trend, plus calendar-month seasonality once two years are
+    available, to consecutive monthly totals starting at ``first_month``
+    (a month index). Returns a function predicting the total of a month.
+    """
+    n = len(values)
+    if n == 0:
+        return lambda index: 0.0
+    mean_t = (n - 1) / 2
+    mean_y = sum(values) / n
+    variance = sum((t - mean_t) ** 2 for t in range(n))
+    slope = 0.0
+    if variance:
+        slope = (
+            sum((t - mean_t) * (y - mean_y) for t, y in enumerate(values)) / variance
+        )
+    intercept = mean_y - slope * mean_t
+
+    seasonal = [0.0] * 12
+    if n >= 24:
+        residuals = defaultdict(list)
+        for t, y in enumerate(values):
+            residuals[(first_month + t) % 12].append(y - intercept - slope * t)
+        for month, month_residuals in residuals.items():
+            seasonal[month] = sum(month_residuals) / len(month_residuals)
+
+    def predict(index):
+        t = index - first_month
+        return max(intercept + slope * t + seasonal[index % 12], 0.0)
+
+    return predict
+
+
+def monthly_totals(queryset, date_field, amount, group_field, start, end):
+    """
+    ``{group: {month index: total}}`` for ``start <= date < end`` in one
+    grouped query.
+    """
+    rows = (
+        queryset.filter(**{f"{date_field}__gte": start, f"{date_field}__lt": end})
+        .order_by()
+        .values(group_field, month=TruncMonth(date_field, output_field=DateField()))
+        .annotate(total=Sum(amount))
+    )
+    totals = defaultdict(dict)
+    for row in rows:
+        if row["total"] is None:
+            continue
+        totals[row[group_field]][month_index(row["month"])] = float(row["total"])
+    return totals
+
+
+def add_totals(totals, more):
+    for group, monthly in more.items():
+        for month, total in monthly.items():
+            totals[group][month] = totals[group].get(month, 0.0) + total
+
+
+def remaining_spending(predict, today, end_date):
+    """
+    Predicted spending from the day after ``today`` to ``end_date``,
+    prorating partial months.
+    """
+    total = 0.0
+    for index in range(month_index(today), month_index(end_date) + 1):
+        first = month_start(index)
+        days = calendar.monthrange(first.year, first.month)[1]
+        start_day = today.day + 1 if index == month_index(today) else 1
+        end_day = end_date.day if index == month_index(end_date) else days
+        if end_day >= start_day:
+            total += predict(index) * (end_day - start_day + 1) / days
+    return total
+
+
+def forecast_goals(user, today, include_archived=False):
+    """
+    Project the outcome of every active goal of ``user``.
+
+    Category goals are spending budgets: spending so far in the goal window
+    plus the predicted spending of the category until its end. The main goal
+    is projected at the pace it was achieved so far, alongside the predicted
+    total spending (expenses and transactions) until its end.
+
+    Monthly history for every category comes from one grouped query per
+    model, each series is fitted once and shared by all goals, and spending
+    so far in each window is one aggregate query for all goals. Archived
+    history is only fitted with ``include_archived``.
+    """
+    goals = list(user.goals.filter(end_date__gte=today).order_by("end_date", "id"))
+    main_goals = list(
+        user.main_goal.filter(end_date__gte=today).order_by("end_date", "id")
+    )
+    if not goals and not main_goals:
+        return {"goals": [], "main_goals": []}
+
+    current_month = month_index(today)
+    history_start = month_start(current_month - settings.FORECAST_HISTORY_MONTHS)
+    history_end = month_start(current_month)
+    amount = converted("amount", user.base_currency)
+    expenses, transactions = defaultdict(dict), defaultdict(dict)
+    for queryset in user_querysets(user, "expenses", include_archived):
+        add_totals(
+            expenses,
+            monthly_totals(
+                queryset, "date", amount, "category", history_start, history_end
+            ),
+        )
+    for queryset in user_querysets(user, "transactions", include_archived):
+        add_totals(
+            transactions,
+            monthly_totals(
+                queryset,
+                "date",
+                amount,
+                "user",
+                timezone.make_aware(datetime.combine(history_start, time())),
+                timezone.make_aware(datetime.combine(history_end, time())),
+            ),
+        )
+
+    # Series start at the first month with any recorded spending
+    months = [month for totals in expenses.values() for month in totals]
+    months += [month for totals in transactions.values() for month in totals]
+    first_month = min(months, default=current_month)
+
+    def series(*totals):
+        return [
+            sum(monthly.get(month, 0.0) for monthly in totals)
+            for month in range(first_month, current_month)
+        ]
+
+    models = {}
+    for goal in goals:
+        if goal.category not in models:
+            models[goal.category] = fit(first_month, series(expenses[goal.category]))
+    if main_goals:
+        models[None] = fit(
+            first_month, series(*expenses.values(), *transactions.values())
+        )
+
+    spent = {}
+    if goals:
+        spent = user.expenses.aggregate(
+            **{
+                f"goal_{goal.pk}": Sum(
+                    amount,
+                    filter=Q(
+                        category=goal.category,
+                        date__gte=goal.start_date,
+                        date__lte=min(goal.end_date, today),
+                    ),
+                )
+                for goal in goals
+            }
+        )
+
+    goal_forecasts = []
+    for goal in goals:
+        spent_amount = float(spent[f"goal_{goal.pk}"] or 0)
+        projected = spent_amount + remaining_spending(
+            models[goal.category],
+            max(today, goal.start_date - timedelta(days=1)),
+            goal.end_date,
+        )
+        goal_forecasts.append(
+            {
+                "id": goal.pk,
+                "category": goal.category,
+                "start_date": goal.start_date,
+                "end_date": goal.end_date,
+                "target_amount": float(goal.target_amount),
+                "spent_amount": round(spent_amount, 2),
+                "projected_amount": round(projected, 2),
+                "on_track": projected <= float(goal.target_amount),
+            }
+        )
+
+    main_goal_forecasts = []
+    for goal in main_goals:
+        achieved = float(goal.achieved_amount)
+        elapsed = (today - goal.start_date).days
+        projected = achieved
+        if elapsed > 0:
+            projected += achieved / elapsed * (goal.end_date - today).days
+        main_goal_forecasts.append(
+            {
+                "id": goal.pk,
+                "start_date": goal.start_date,
+                "end_date": goal.end_date,
+                "target_amount": float(goal.target_amount),
+                "achieved_amount": achieved,
+                "projected_amount": round(projected, 2),
+                "projected_spending": round(
+                    remaining_spending(models[None], today, goal.end_date), 2
+                ),
+                "on_track": projected >= float(goal.target_amount),
+            }
+        )
+
+    return {"goals": goal_forecasts, "main_goals": main_goal_forecasts}
@@ -0,0 +1,128 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password,
+    make_password,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-in requests, please try again shortly."
+    default_code = "password_hashing_busy"
+    wait = 1  # Sent as Retry-After
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the work factor taken from PASSWORD_HASH_ITERATIONS.
+
+    The algorithm name is unchanged, so stored hashes keep verifying and are
+    rehashed with the new work factor the next time their user logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+
+class HashingPool:
+    """
+    Runs password hashing on a fixed number of threads.
+
+    Hashing (PBKDF2 releases the GIL) is CPU bound, so a login burst handled
+    directly by request threads can starve every other endpoint. Here at
+    most ``workers`` hashes run at once, ``queue_size`` more may wait, and
+    requests beyond that are rejected immediately instead of piling up.
+    With ``workers`` set to 0 hashing runs inline.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = None
+        if workers:
+            self.executor = ThreadPoolExecutor(workers, "password-hashing")
+            self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, func, *args, **kwargs):
+        if self.executor is None:
+            return func(*args, **kwargs)
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self.executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda future: self.slots.release())
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise PasswordHashingBusy()
+
+
+pool = None
+pool_lock = threading.Lock()
+
+
+def get_pool():
+    global pool
+    with pool_lock:
+        if pool is None:
+            workers = settings.PASSWORD_HASHING_WORKERS
+            if workers is None:
+                workers = os.cpu_count() or 1
+            pool = HashingPool(
+                workers,
+                settings.PASSWORD_HASHING_QUEUE_SIZE,
+                settings.PASSWORD_HASHING_TIMEOUT,
+            )
+        return pool
+
+
+def hash_password(raw_password):
+    return get_pool().run(make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """
+    Return ``(is_correct, must_update)`` for a raw password against a hash.
+    """
+    must_update = []
+    is_correct = get_pool().run(
+        check_password, raw_password, encoded, setter=must_update.append
+    )
+    return is_correct, bool(must_update)
+
+
+def authenticate(username, password):
+    """
+    ModelBackend.authenticate with hashing on the hashing pool. Outdated
+    hashes are upgraded after a successful login.
+    """
+    UserModel = get_user_model()
+    if username is None or password is None:
+        return None
+    try:
+        user = UserModel._default_manager.get_by_natural_key(username)
+    except UserModel.DoesNotExist:
+        # Hash once anyway so unknown usernames take as long as known ones
+        hash_password(password)
+        return None
+
+    is_correct, must_update = verify_password(password, user.password)
+    if not is_correct or not user.is_active:
+        return None
+    if must_update:
+        user.password = hash_password(password)
+        user.save(update_fields=["password"])
+    return user
@@ -0,0 +1,102 @@
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyRecord
+from .renderers import FastJSONRenderer
+
+KEY_MAX_LENGTH = IdempotencyRecord._meta.get_field("key").max_length
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.content_type):
+        digest.update(part.encode() + b"\0")
+    digest.update(request.body)
+    return digest.digest()
+
+
+def find_record(user, key):
+    """
+    The unexpired record of ``key``. An expired one is deleted, so the key
+    can be used again.
+    """
+    record = IdempotencyRecord.objects.filter(user=user, key=key).first()
+    if record is not None and record.created_at < expiry_cutoff():
+        record.delete()
+        return None
+    return record
+
+
+def expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def replay(record, fingerprint):
+    if bytes(record.fingerprint) != fingerprint:
+        return Response(
+            {"detail": "This Idempotency-Key was used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = HttpResponse(
+        record.body, status=record.status_code, content_type="application/json"
+    )
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(handler):
+    """
+    Make a view's create handler replay its response when a request is
+    retried with the same ``Idempotency-Key`` header, instead of validating
+    and inserting again. Keys are scoped to the user and kept for
+    IDEMPOTENCY_KEY_TTL seconds. Server errors are not recorded, so those
+    requests can be retried.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return handler(view, request, *args, **kwargs)
+        if not 0 < len(key) <= KEY_MAX_LENGTH:
+            return Response(
+                {
+                    "detail": "Idempotency-Key must be 1 to "
+                    f"{KEY_MAX_LENGTH} characters long."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        record = find_record(request.user, key)
+        if record is not None:
+            return replay(record, fingerprint)
+        try:
+            # The record commits with the rows the handler creates, and a
+            # concurrent retry fails to insert it and replays the winner's
+            with transaction.atomic():
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code < 500:
+                    IdempotencyRecord.objects.create(
+                        user=request.user,
+                        key=key,
+                        fingerprint=fingerprint,
+                        status_code=response.status_code,
+                        body=FastJSONRenderer().render(response.data),
+                    )
+        except IntegrityError:
+            record = find_record(request.user, key)
+            if record is None:
+                raise
+            return replay(record, fingerprint)
+        return response
+
+    return wrapper
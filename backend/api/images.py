@@ -0,0 +1,111 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+# Square sizes, in pixels, generated for every profile photo
+PHOTO_VARIANT_SIZES = {"thumbnail": 96, "small": 256, "medium": 512}
+PHOTO_VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def generate_photo_variants(name, storage=default_storage):
+    """
+    Create the resized variants of an image in storage and return their
+    names as ``{size: {format: name}}``.
+    """
+    # Pillow is only needed once a photo is uploaded, keep it out of startup
+    from PIL import Image, ImageOps
+
+    largest = max(PHOTO_VARIANT_SIZES.values())
+    with storage.open(name, "rb") as file:
+        image = Image.open(file)
+        # Let JPEG decoding downscale by powers of two right away
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    root = os.path.splitext(name)[0]
+    variants = {}
+    for label, size in PHOTO_VARIANT_SIZES.items():
+        resized = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variants[label] = {}
+        for extension, (image_format, options) in PHOTO_VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            variant_name = f"{root}_{label}.{extension}"
+            storage.delete(variant_name)
+            variants[label][extension] = storage.save(
+                variant_name, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def delete_photo_variants(variants, storage=default_storage):
+    for formats in variants.values():
+        for name in formats.values():
+            storage.delete(name)
+
+
+def process_profile_photo(user_id, name):
+    from .models import User
+
+    try:
+        variants = generate_photo_variants(name)
+    except Exception:
+        logger.exception("Could not create variants of %s", name)
+        return
+    # The photo may have been replaced while this one was processed
+    updated = User.objects.filter(pk=user_id, photo=name).update(
+        photo_variants=variants
+    )
+    if not updated:
+        delete_photo_variants(variants)
+
+
+def process_in_background(user_id, name):
+    close_old_connections()
+    try:
+        process_profile_photo(user_id, name)
+    except Exception:
+        logger.exception("Could not store variants of %s", name)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                settings.IMAGE_PROCESSING_WORKERS, "image-processing"
+            )
+        return executor
+
+
+def schedule_profile_photo(user):
+    """
+    Create the variants of the user's photo once the current transaction
+    commits, on a background thread unless IMAGE_PROCESSING_WORKERS is 0.
+    """
+    user_id, name = user.pk, user.photo.name
+
+    def process():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(process_in_background, user_id, name)
+        else:
+            process_profile_photo(user_id, name)
+
+    transaction.on_commit(process)
@@ -0,0 +1,107 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from api.models import (
+    Account,
+    Bill,
+    Expense,
+    Goal,
+    Transaction,
+    account_choices,
+    category_choices,
+)
+
+CATEGORIES = [choice[0] for choice in category_choices]
+ACCOUNT_TYPES = [choice[0] for choice in account_choices]
+
+
+def random_amount(rng, high=5000):
+    return Decimal(rng.randint(1, high * 100)) / 100
+
+
+def build_instances(user, rows, seed=0):
+    """
+    Build unsaved model instances for every list endpoint, keyed by model.
+    """
+    rng = random.Random(seed)
+    now = timezone.now().replace(microsecond=0)
+    today = timezone.localdate()
+    return {
+        Transaction: [
+            Transaction(
+                id=i + 1,
+                user=user,
+                title=f"Transaction {i}",
+                shop_name=f"Shop {i % 50}" if i % 3 else None,
+                date=now - timedelta(minutes=17 * i),
+                amount=random_amount(rng),
+            )
+            for i in range(rows)
+        ],
+        Expense: [
+            Expense(
+                id=i + 1,
+                user=user,
+                category=CATEGORIES[i % len(CATEGORIES)],
+                title=f"Expense {i}",
+                amount=random_amount(rng),
+                date=today - timedelta(days=i % 730),
+            )
+            for i in range(rows)
+        ],
+        Bill: [
+            Bill(
+                id=i + 1,
+                user=user,
+                title=f"Bill {i}",
+                description="Monthly payment" if i % 2 else None,
+                due_date=today + timedelta(days=i % 365),
+                amount=random_amount(rng),
+                recurring=bool(i % 2),
+            )
+            for i in range(rows)
+        ],
+        Account: [
+            Account(
+                id=i + 1,
+                user=user,
+                account_type=ACCOUNT_TYPES[i % len(ACCOUNT_TYPES)],
+                account_number=f"{i:016d}",
+                balance=random_amount(rng, high=100000),
+                organization_name=f"Bank {i % 20}",
+            )
+            for i in range(rows)
+        ],
+        Goal: [
+            Goal(
+                id=i + 1,
+                user=user,
+                category=CATEGORIES[i % len(CATEGORIES)],
+                target_amount=Decimal("1000.00"),
+                achieved_amount=random_amount(rng, high=1000),
+                start_date=today - timedelta(days=i % 365),
+                end_date=today + timedelta(days=30),
+            )
+            for i in range(rows)
+        ],
+    }
+
+
+def create_sample_rows(user, rows, start=0):
+    """
+    Save ``rows`` sample rows of every model for ``user``, built and inserted
+    10000 at a time to keep memory small. ``start`` seeds the values when
+    adding more rows to the same user. Returns the number of rows saved.
+    """
+    saved = 0
+    for offset in range(start, start + rows, 10000):
+        chunk = min(10000, start + rows - offset)
+        for model, instances in build_instances(user, chunk, offset).items():
+            for instance in instances:
+                instance.pk = None
+            model.objects.bulk_create(instances, batch_size=1000)
+            saved += len(instances)
+    return saved
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from api.archive import ARCHIVES, archive_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Move transactions and expenses older than ARCHIVE_AFTER_DAYS into "
+        "the archive tables, in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the rows to move."
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        for model in ARCHIVES:
+            model_cutoff = cutoff
+            if not isinstance(model._meta.get_field("date"), models.DateTimeField):
+                model_cutoff = timezone.localdate(cutoff)
+            if options["dry_run"]:
+                count = model.objects.filter(date__lt=model_cutoff).count()
+                verb = "Would move"
+            else:
+                count = archive_rows(model, model_cutoff, options["batch_size"])
+                verb = "Moved"
+            self.stdout.write(
+                f"{verb} {count} {model._meta.verbose_name_plural.lower()} "
+                f"dated before {model_cutoff:%Y-%m-%d}."
+            )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.backup import backup_chunks
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = "Write a user's data and profile to a backup archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']!r}.")
+
+        size = 0
+        with open(options["path"], "wb") as file:
+            for chunk in backup_chunks(user, options["batch_size"]):
+                file.write(chunk)
+                size += len(chunk)
+        self.stdout.write(f"Wrote {size} bytes to {options['path']}.")
@@ -0,0 +1,65 @@
+import io
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.backup import backup_chunks, restore_backup
+from api.models import User
+
+from ._sample_data import create_sample_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the backup and restore of a user with sample rows in every "
+        "model. Sample rows are written inside a transaction that is rolled "
+        "back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200000, help="Rows per model.")
+        parser.add_argument(
+            "--memory",
+            action="store_true",
+            help="Also measure peak Python memory, in a second, slower pass.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username="benchmark-backup")
+            restored = User.objects.create(username="benchmark-restore")
+            total = create_sample_rows(user, options["rows"])
+
+            started = time.perf_counter()
+            archive = io.BytesIO()
+            for chunk in backup_chunks(user):
+                archive.write(chunk)
+            backup_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            archive.seek(0)
+            restore_backup(restored, archive)
+            restore_seconds = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{total} rows: backup {backup_seconds:.1f} s, "
+                f"{archive.tell() / 2**20:.1f} MiB; restore {restore_seconds:.1f} s"
+            )
+
+            if options["memory"]:
+                tracemalloc.start()
+                for _ in backup_chunks(user):
+                    pass
+                _, backup_peak = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                archive.seek(0)
+                restore_backup(restored, archive)
+                _, restore_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"Peak memory: backup {backup_peak / 2**20:.1f} MiB, "
+                    f"restore {restore_peak / 2**20:.1f} MiB"
+                )
+            transaction.set_rollback(True)
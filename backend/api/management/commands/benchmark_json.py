@@ -0,0 +1,70 @@
+import io
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Account, Bill, Expense, Goal, Transaction, User
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import (
+    AccountSerializer,
+    BillSerializer,
+    ExpenseSerializer,
+    GoalSerializer,
+    TransactionSerializer,
+)
+
+from ._sample_data import build_instances
+
+LIST_ENDPOINTS = [
+    ("transactions/", Transaction, TransactionSerializer),
+    ("expenses/", Expense, ExpenseSerializer),
+    ("bills/", Bill, BillSerializer),
+    ("accounts/", Account, AccountSerializer),
+    ("goals/", Goal, GoalSerializer),
+]
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer/JSONParser with the orjson-backed versions on list endpoint payloads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError("orjson is not installed, nothing to compare.")
+
+        rows, repeat = options["rows"], options["repeat"]
+        instances = build_instances(User(username="benchmark"), rows)
+
+        self.stdout.write(f"{rows} rows per endpoint, best of {repeat} runs")
+        self.stdout.write(
+            f"{'endpoint':<16}{'render':>10}{'fast':>10}{'x':>7}"
+            f"{'parse':>10}{'fast':>10}{'x':>7}"
+        )
+        for name, model, serializer_class in LIST_ENDPOINTS:
+            data = serializer_class(instances[model], many=True).data
+
+            expected = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != expected:
+                raise CommandError(f"{name}: rendered output differs")
+
+            render = self.best(lambda: JSONRenderer().render(data), repeat)
+            fast_render = self.best(lambda: FastJSONRenderer().render(data), repeat)
+            parse = self.best(lambda: JSONParser().parse(io.BytesIO(expected)), repeat)
+            fast_parse = self.best(
+                lambda: FastJSONParser().parse(io.BytesIO(expected)), repeat
+            )
+            self.stdout.write(
+                f"{name:<16}{render * 1000:>8.1f}ms{fast_render * 1000:>8.1f}ms"
+                f"{render / fast_render:>6.1f}x"
+                f"{parse * 1000:>8.1f}ms{fast_parse * 1000:>8.1f}ms"
+                f"{parse / fast_parse:>6.1f}x"
+            )
+
+    def best(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
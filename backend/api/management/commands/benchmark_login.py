@@ -0,0 +1,100 @@
+import statistics
+import threading
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from rest_framework.authtoken.models import Token
+from rest_framework.views import APIView
+
+from api import hashing
+from api.models import User
+
+PASSWORD = "Benchmark-pass-1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure login throughput, and the latency of another endpoint during "
+        "a login burst, with hashing inline and on the hashing pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--duration", type=float, default=5)
+        parser.add_argument("--login-threads", type=int, default=16)
+        parser.add_argument("--other-threads", type=int, default=2)
+        parser.add_argument("--workers", type=int, default=2)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username="benchmark-login", password=PASSWORD)
+        token = Token.objects.create(user=user)
+        try:
+            # Throttling would reject most of the burst
+            with mock.patch.object(APIView, "get_throttles", return_value=[]):
+                self.report("baseline (no logins)", options, token, logins=False)
+                hashing.pool = hashing.HashingPool(0, 0, None)
+                self.report("inline hashing", options, token)
+                hashing.pool = hashing.HashingPool(
+                    options["workers"], options["login_threads"], 30
+                )
+                self.report(
+                    f"hashing pool ({options['workers']} workers)", options, token
+                )
+        finally:
+            hashing.pool = None
+            user.delete()
+
+    def report(self, label, options, token, logins=True):
+        stop = threading.Event()
+        login_times, other_times = [], []
+
+        def login():
+            client = Client()
+            while not stop.is_set():
+                started = time.perf_counter()
+                client.post(
+                    "/api/v1/login/",
+                    {"username": "benchmark-login", "password": PASSWORD},
+                    content_type="application/json",
+                )
+                login_times.append(time.perf_counter() - started)
+            connection.close()
+
+        def other():
+            client = Client(HTTP_AUTHORIZATION=f"Token {token.key}")
+            while not stop.is_set():
+                started = time.perf_counter()
+                client.get("/api/v1/profile/")
+                other_times.append(time.perf_counter() - started)
+            connection.close()
+
+        threads = [
+            threading.Thread(target=other) for _ in range(options["other_threads"])
+        ]
+        if logins:
+            threads += [
+                threading.Thread(target=login) for _ in range(options["login_threads"])
+            ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options["duration"])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        line = f"{label:<28}"
+        if login_times:
+            line += (
+                f" logins/s {len(login_times) / options['duration']:>6.1f}"
+                f"  login p95 {self.p95(login_times):>7.1f}ms"
+            )
+        line += (
+            f"  profile p50 {statistics.median(other_times) * 1000:>6.1f}ms"
+            f"  p95 {self.p95(other_times):>7.1f}ms"
+        )
+        self.stdout.write(line)
+
+    def p95(self, times):
+        return statistics.quantiles(times, n=20)[-1] * 1000
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.memory import MEMORY_ENDPOINTS, measure_memory
+from api.models import User
+
+from ._sample_data import create_sample_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the peak memory of list and dashboard requests with "
+        "tracemalloc, at increasing numbers of rows per model, and check it "
+        "against MEMORY_BYTES_PER_ROW_BUDGET. Sample rows are written inside "
+        "a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000, 10000, 100000]
+        )
+        parser.add_argument(
+            "--endpoint", action="append", choices=MEMORY_ENDPOINTS, default=[]
+        )
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=settings.MEMORY_BYTES_PER_ROW_BUDGET,
+            help="Peak bytes per row allowed, 0 to only report.",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = options["endpoint"] or MEMORY_ENDPOINTS
+        budget = options["budget"]
+        over = []
+        with transaction.atomic():
+            user = User.objects.create(username="benchmark-memory")
+            seeded = 0
+            self.stdout.write(
+                f"{'endpoint':<18}{'rows':>8}{'peak MiB':>10}"
+                f"{'bytes/row':>11}{'blocks/row':>12}"
+            )
+            for rows in sorted(options["rows"]):
+                create_sample_rows(user, rows - seeded, seeded)
+                seeded = rows
+
+                for name in endpoints:
+                    result = measure_memory(user, name)
+                    if result["status"] != 200:
+                        raise CommandError(f"{name}: status {result['status']}")
+                    per_row = result["peak"] / rows
+                    self.stdout.write(
+                        f"{name:<18}{rows:>8}{result['peak'] / 2**20:>10.1f}"
+                        f"{per_row:>11.0f}{result['blocks'] / rows:>12.1f}"
+                    )
+                    if budget and per_row > budget:
+                        over.append(f"{name} at {rows} rows")
+            transaction.set_rollback(True)
+
+        if over:
+            raise CommandError(
+                f"Over MEMORY_BYTES_PER_ROW_BUDGET ({budget:.0f}): {', '.join(over)}."
+            )
@@ -0,0 +1,83 @@
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import User
+from api.serializers import (
+    AccountSerializer,
+    AccountValuesSerializer,
+    BillSerializer,
+    BillValuesSerializer,
+    ExpenseSerializer,
+    ExpenseValuesSerializer,
+    GoalSerializer,
+    GoalValuesSerializer,
+    TransactionSerializer,
+    TransactionValuesSerializer,
+)
+
+from ._sample_data import create_sample_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ModelSerializer and ValuesSerializer list serialization. "
+        "Sample rows are written inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+
+        with transaction.atomic():
+            user = User.objects.create(username="benchmark-serializers")
+            create_sample_rows(user, rows)
+
+            cases = [
+                (
+                    "transactions/",
+                    user.transactions,
+                    TransactionSerializer,
+                    TransactionValuesSerializer,
+                ),
+                (
+                    "expenses/",
+                    user.expenses,
+                    ExpenseSerializer,
+                    ExpenseValuesSerializer,
+                ),
+                ("bills/", user.bills, BillSerializer, BillValuesSerializer),
+                (
+                    "accounts/",
+                    user.accounts,
+                    AccountSerializer,
+                    AccountValuesSerializer,
+                ),
+                ("goals/", user.goals, GoalSerializer, GoalValuesSerializer),
+            ]
+            self.stdout.write(f"{rows} rows per endpoint, best of {repeat} runs")
+            self.stdout.write(f"{'endpoint':<16}{'model':>10}{'values':>10}{'x':>7}")
+            for name, manager, serializer_class, values_serializer in cases:
+                expected = serializer_class(manager.all(), many=True).data
+                if values_serializer.serialize(manager.all()) != expected:
+                    raise CommandError(f"{name}: serialized output differs")
+
+                slow = self.best(
+                    lambda: serializer_class(manager.all(), many=True).data, repeat
+                )
+                fast = self.best(
+                    lambda: values_serializer.serialize(manager.all()), repeat
+                )
+                self.stdout.write(
+                    f"{name:<16}{slow * 1000:>8.0f}ms{fast * 1000:>8.0f}ms"
+                    f"{slow / fast:>6.1f}x"
+                )
+
+            transaction.set_rollback(True)
+
+    def best(self, func, repeat):
+        return min(timeit.repeat(func, number=1, repeat=repeat))
@@ -0,0 +1,26 @@
+import statistics
+
+from django.core.management.base import BaseCommand
+
+from api.startup import measure_startup
+
+
+class Command(BaseCommand):
+    help = "Measure worker startup time and peak RSS with and without API_DOCS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--module", default="backend.wsgi")
+
+    def handle(self, *args, **options):
+        for api_docs in ("False", "True"):
+            runs = [
+                measure_startup(options["module"], env={"API_DOCS": api_docs})
+                for _ in range(options["runs"])
+            ]
+            seconds = statistics.median(run["seconds"] for run in runs)
+            rss = statistics.median(run["rss_kb"] for run in runs)
+            self.stdout.write(
+                f"API_DOCS={api_docs}: startup {seconds * 1000:.0f} ms, "
+                f"peak RSS {rss / 1024:.1f} MiB (median of {options['runs']})"
+            )
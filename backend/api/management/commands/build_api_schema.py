@@ -0,0 +1,35 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.docs import get_api_info
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the OpenAPI schema to API_SCHEMA_PATH at build time, to be "
+        "served statically at /openapi.json."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", default=None, help="Defaults to API_SCHEMA_PATH."
+        )
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS:
+            # Without drf_yasg the views carry no request body annotations
+            raise CommandError("Set API_DOCS=True to build the schema.")
+        from drf_yasg.codecs import OpenAPICodecJson
+        from drf_yasg.generators import OpenAPISchemaGenerator
+
+        logging.disable(logging.WARNING)
+        generator = OpenAPISchemaGenerator(get_api_info())
+        schema = generator.get_schema(request=None, public=True)
+        content = OpenAPICodecJson(validators=[]).encode(schema)
+
+        output = options["output"] or settings.API_SCHEMA_PATH
+        with open(output, "wb") as file:
+            file.write(content)
+        self.stdout.write(f"Wrote {len(content)} bytes to {output}.")
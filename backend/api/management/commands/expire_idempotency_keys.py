@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import expiry_cutoff
+from api.models import IdempotencyRecord
+from api.purge import delete_in_batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete idempotency records older than IDEMPOTENCY_KEY_TTL, in "
+        "batches. Run it periodically to keep the table small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = delete_in_batches(
+            IdempotencyRecord.objects.filter(created_at__lt=expiry_cutoff()),
+            options["batch_size"],
+        )
+        self.stdout.write(f"Deleted {deleted} expired idempotency records.")
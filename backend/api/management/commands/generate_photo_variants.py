@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_photo_variants
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = "Create the resized variants of profile photos that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Regenerate existing variants too."
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(photo="")
+        if not options["all"]:
+            users = users.filter(photo_variants={})
+
+        # Users still on the default photo share its variants
+        names = users.order_by().values_list("photo", flat=True).distinct()
+        for name in list(names):
+            try:
+                variants = generate_photo_variants(name)
+            except Exception as error:
+                self.stderr.write(f"{name}: {error}")
+                continue
+            updated = users.filter(photo=name).update(photo_variants=variants)
+            self.stdout.write(f"{name}: {updated} user(s)")
@@ -0,0 +1,67 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from api.currency import clear_exchange_rates
+from api.models import DashboardSnapshot, ExchangeRate, currency_choices
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with currency, rate and optional "
+        "date columns. Rates are the value of one unit in FX_REFERENCE_CURRENCY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, *args, **options):
+        currencies = {currency for currency, _ in currency_choices}
+        rates = []
+        with open(options["path"], newline="") as file:
+            for line, row in enumerate(csv.DictReader(file), start=2):
+                currency = (row.get("currency") or "").strip().upper()
+                if currency not in currencies:
+                    raise CommandError(f"Line {line}: unknown currency {currency!r}.")
+                try:
+                    rate = Decimal(row["rate"])
+                    day = (
+                        date.fromisoformat(row["date"])
+                        if row.get("date")
+                        else date.today()
+                    )
+                except (KeyError, InvalidOperation, ValueError) as error:
+                    raise CommandError(f"Line {line}: {error}")
+                if rate <= 0:
+                    raise CommandError(f"Line {line}: rates must be positive.")
+                rates.append(ExchangeRate(currency=currency, date=day, rate=rate))
+
+        latest = dict(
+            ExchangeRate.objects.values("currency")
+            .annotate(Max("date"))
+            .values_list("currency", "date__max")
+        )
+        with transaction.atomic():
+            ExchangeRate.objects.bulk_create(
+                rates,
+                update_conflicts=True,
+                unique_fields=["currency", "date"],
+                update_fields=["rate"],
+            )
+            # Snapshots hold totals converted at the latest rates, so any
+            # rate loaded for the latest day or after makes them stale
+            if any(
+                rate.currency not in latest or rate.date >= latest[rate.currency]
+                for rate in rates
+            ):
+                DashboardSnapshot.objects.all().delete()
+        # Other processes pick the rates up within FX_RATES_CACHE_SECONDS
+        clear_exchange_rates()
+        self.stdout.write(
+            f"Loaded {len(rates)} rates in {settings.FX_REFERENCE_CURRENCY}."
+        )
@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from api.dashboards import store_snapshots
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the dashboard charts of all active users into snapshots, "
+        "to be run nightly. The dashboard merges in expenses dated after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes, 0 to compute in this process.",
+        )
+        parser.add_argument(
+            "--as-of",
+            type=date.fromisoformat,
+            help="Cover data dated before this day (default: today).",
+        )
+
+    def handle(self, *args, **options):
+        as_of = options["as_of"] or timezone.now().date()
+        chunk_size = options["chunk_size"]
+        user_ids = list(
+            User.objects.filter(is_active=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        chunks = [
+            user_ids[index : index + chunk_size]
+            for index in range(0, len(user_ids), chunk_size)
+        ]
+
+        if options["workers"]:
+            # Forked workers must not share the connections of this process
+            connections.close_all()
+            with ProcessPoolExecutor(options["workers"]) as executor:
+                stored = sum(
+                    executor.map(store_snapshots, chunks, [as_of] * len(chunks))
+                )
+        else:
+            stored = sum(store_snapshots(chunk, as_of) for chunk in chunks)
+
+        self.stdout.write(f"Stored {stored} dashboard snapshots as of {as_of}.")
@@ -0,0 +1,52 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.startup import measure_startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the cumulative import costs of a cold worker start, from "
+        "python -X importtime, and check it against STARTUP_TIME_BUDGET."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module", choices=["backend.wsgi", "backend.asgi"], default="backend.wsgi"
+        )
+        parser.add_argument("--limit", type=int, default=25)
+        parser.add_argument(
+            "--packages",
+            action="store_true",
+            help="Sum the costs per top-level package instead of listing modules.",
+        )
+
+    def handle(self, *args, **options):
+        startup = measure_startup(options["module"], importtime=True)
+        imports = startup["imports"]
+
+        if options["packages"]:
+            costs = defaultdict(int)
+            for name, self_us, _, _ in imports:
+                costs[name.partition(".")[0]] += self_us
+            rows = sorted(costs.items(), key=lambda row: -row[1])
+            self.stdout.write(f"{'self ms':>9}  package")
+        else:
+            rows = sorted(
+                ((name, cumulative) for name, _, cumulative, _ in imports),
+                key=lambda row: -row[1],
+            )
+            self.stdout.write(f"{'cum. ms':>9}  module")
+        for name, microseconds in rows[: options["limit"]]:
+            self.stdout.write(f"{microseconds / 1000:9.1f}  {name}")
+
+        budget = settings.STARTUP_TIME_BUDGET
+        self.stdout.write(
+            f"\n{options['module']} ready in {startup['seconds'] * 1000:.0f} ms "
+            f"(budget {budget * 1000:.0f} ms), {len(imports)} modules imported, "
+            f"peak RSS {startup['rss_kb'] / 1024:.1f} MiB."
+        )
+        if startup["seconds"] > budget:
+            raise CommandError("Startup is over STARTUP_TIME_BUDGET.")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import User
+from api.purge import purge_user, request_purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete users and all their data in batches. Without --user, resume "
+        "the purges of accounts deleted through the API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", type=int, action="append", default=[], help="User id."
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["user"]:
+            users = list(User.objects.filter(pk__in=options["user"]))
+            if len(users) != len(set(options["user"])):
+                raise CommandError("Unknown user id.")
+            for user in users:
+                request_purge(user)
+            user_ids = [user.pk for user in users]
+        else:
+            user_ids = list(
+                User.objects.filter(purge_requested_at__isnull=False)
+                .order_by("purge_requested_at")
+                .values_list("pk", flat=True)
+            )
+
+        for user_id in user_ids:
+            counts = purge_user(
+                user_id,
+                options["batch_size"],
+                lambda model, deleted: self.stdout.write(
+                    f"User {user_id}: {deleted} {model._meta.label} rows deleted"
+                ),
+            )
+            self.stdout.write(
+                f"Purged user {user_id}, {sum(counts.values())} rows deleted."
+            )
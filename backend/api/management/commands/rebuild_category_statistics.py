@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import anomalies
+from api.currency import convert
+from api.models import CategoryStatistics, Expense
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the rolling category statistics and anomaly scores by "
+        "replaying every expense in the order they were recorded. With "
+        "--stale, only the categories marked stale by edits and deletes are "
+        "replayed, which is meant to run periodically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--stale", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["stale"]:
+            return self.replay_stale()
+        batch_size = options["batch_size"]
+        expenses = (
+            Expense.objects.order_by("user_id", "category", "id")
+            .values_list(
+                "id", "user_id", "category", "amount", "currency", "user__base_currency"
+            )
+            .iterator(chunk_size=batch_size)
+        )
+
+        with transaction.atomic():
+            CategoryStatistics.objects.all().delete()
+            statistics = {}
+            scored = []
+            for pk, user_id, category, amount, currency, base_currency in expenses:
+                amount = convert(amount, currency, base_currency)
+                key = user_id, category
+                if amount is not None and key not in statistics:
+                    statistics[key] = CategoryStatistics(
+                        user_id=user_id, category=category
+                    )
+                scored.append(
+                    Expense(
+                        pk=pk,
+                        anomaly_score=anomalies.observe(statistics.get(key), amount),
+                    )
+                )
+                if len(scored) >= batch_size:
+                    Expense.objects.bulk_update(scored, ["anomaly_score"])
+                    scored = []
+            Expense.objects.bulk_update(scored, ["anomaly_score"])
+            CategoryStatistics.objects.bulk_create(
+                statistics.values(), batch_size=batch_size
+            )
+
+        self.stdout.write(f"Rebuilt statistics for {len(statistics)} user categories.")
+
+    def replay_stale(self):
+        stale = list(
+            CategoryStatistics.objects.filter(stale=True).values_list(
+                "user_id", "category"
+            )
+        )
+        for user_id, category in stale:
+            # One transaction per category, so writes wait on one lock at a time
+            with transaction.atomic():
+                anomalies.replay_category(user_id, category)
+        self.stdout.write(f"Replayed {len(stale)} stale user categories.")
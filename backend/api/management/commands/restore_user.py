@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.backup import BackupError, restore_backup
+from api.models import User
+
+
+class Command(BaseCommand):
+    help = "Replace a user's data and profile with a backup archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['username']!r}.")
+
+        with open(options["path"], "rb") as file:
+            try:
+                counts = restore_backup(
+                    user,
+                    file,
+                    lambda model, restored: self.stdout.write(
+                        f"{restored} {model._meta.label} rows restored"
+                    ),
+                )
+            except BackupError as error:
+                raise CommandError(str(error))
+        self.stdout.write(f"Restored {sum(counts.values())} rows.")
@@ -0,0 +1,41 @@
+import gc
+import tracemalloc
+
+from django.urls import resolve, reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+# Endpoints whose responses grow with the user's data
+MEMORY_ENDPOINTS = [
+    "transaction-list",
+    "expense-list",
+    "bill-list",
+    "account-list",
+    "goal-list",
+    "category-expense",
+    "dashboard",
+]
+
+
+def measure_memory(user, name):
+    """
+    Memory used while ``user`` requests the endpoint ``name`` and its
+    response is rendered: ``peak`` traced bytes above what was allocated
+    before, and the number of ``blocks`` allocated during the request that
+    are still held once the response is rendered.
+    """
+    request = APIRequestFactory().get(reverse(name))
+    force_authenticate(request, user)
+    # Unthrottled, so that measuring endpoints in a row is not rate limited
+    view = resolve(request.path).func.view_class.as_view(throttle_classes=[])
+    gc.collect()
+    tracemalloc.start()
+    try:
+        response = view(request)
+        response.render()
+        _, peak = tracemalloc.get_traced_memory()
+        blocks = sum(
+            stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+        )
+    finally:
+        tracemalloc.stop()
+    return {"status": response.status_code, "peak": peak, "blocks": blocks}
@@ -0,0 +1,117 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.views import APIView
+
+from .profiling import is_staff, profile_request, profiling_requested
+from .queries import QueryRecorder, format_query
+from .routers import RoutingState, choose_replica, routing_state
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests to API views read from a replica.
+
+    A view opts out with ``read_from_replica = False``. After a request
+    writes, the same credentials are pinned to the primary for
+    ``REPLICA_STICKY_SECONDS`` so their client reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing_state.reset(token)
+        if state.wrote:
+            cache.set_many(
+                dict.fromkeys(self.sticky_keys(request, state.issued), True),
+                settings.REPLICA_STICKY_SECONDS,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routing_state.get()
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            state is None
+            or request.method not in SAFE_METHODS
+            or view_class is None
+            or not getattr(
+                view_class, "read_from_replica", issubclass(view_class, APIView)
+            )
+            or cache.get_many(self.sticky_keys(request, state.issued))
+        ):
+            return None
+        state.replica = choose_replica()
+        return None
+
+    def sticky_keys(self, request, issued=()):
+        # Pin the client's credentials only: many clients can share an
+        # address behind a proxy. A login pins the token it returns, see
+        # pin_credentials()
+        clients = [
+            request.META.get("HTTP_AUTHORIZATION"),
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+            *issued,
+        ]
+        return [
+            "replica-sticky:" + hashlib.sha256(client.encode()).hexdigest()
+            for client in clients
+            if client
+        ]
+
+
+class QueryInspectionMiddleware:
+    """
+    Development aid logging the statements a request runs once per row.
+
+    Enabled with QUERY_INSPECTION. A statement run QUERY_INSPECTION_THRESHOLD
+    times or more, ignoring its parameters, is logged as a warning with the
+    project code that ran it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+            if response.streaming:
+                # The queries of a stream run as it is consumed
+                return response
+        repeated = recorder.repeated(settings.QUERY_INSPECTION_THRESHOLD)
+        if repeated:
+            logger.warning(
+                "%s %s repeated queries:\n%s",
+                request.method,
+                request.path,
+                "\n".join(format_query(*query) for query in repeated),
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests of staff users sending an ``X-Profile`` header or a
+    ``profile`` query parameter, see api.profiling. Other requests only pay
+    for that check.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if profiling_requested(request) and is_staff(request):
+            return profile_request(request, self.get_response)
+        return self.get_response(request)
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
 
 
@@ -10,6 +10,12 @@ account_choices = (
     ("loan", "Loan"),
 )
 
+currency_choices = (
+    ("UZS", "Uzbekistani sum"),
+    ("USD", "US dollar"),
+    ("EUR", "Euro"),
+)
+
 category_choices = (
     ("housing", "Housing"),
     ("food", "Food"),
@@ -26,36 +32,96 @@ class User(AbstractUser):
     photo = models.ImageField(
         upload_to="img/profile", default="img/profile/default.jpg"
     )
+    # Totals across currencies are converted into this one
+    base_currency = models.CharField(
+        max_length=3, choices=currency_choices, default="UZS"
+    )
+    # Resized copies of the photo, {size: {format: name}}, see api.images
+    photo_variants = models.JSONField(default=dict, blank=True)
+    # Set when the account was deactivated to be deleted, see api.purge
+    purge_requested_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     def __str__(self) -> str:
         return self.username
 
+    def save(self, *args, **kwargs):
+        from .anomalies import mark_stale
+
+        update_fields = kwargs.get("update_fields")
+        if self._state.adding or (
+            update_fields is not None and "base_currency" not in update_fields
+        ):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(using=kwargs.get("using")):
+            previous = (
+                User.objects.filter(pk=self.pk)
+                .values_list("base_currency", flat=True)
+                .first()
+            )
+            super().save(*args, **kwargs)
+            if previous in (None, self.base_currency):
+                return
+            # Snapshots and category statistics hold amounts converted into
+            # the base currency
+            DashboardSnapshot.objects.filter(user=self).delete()
+            mark_stale(self.pk, [category for category, _ in category_choices])
+
     class Meta:
         verbose_name_plural = "Users"
 
 
-class Transaction(models.Model):
-    user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="transactions"
-    )
-    title = models.CharField(max_length=100)
+class TransactionRecord(models.Model):
+    # Indexed for the admin's prefix search, see LargeTableAdmin
+    title = models.CharField(max_length=100, db_index=True)
     shop_name = models.CharField(max_length=100, blank=True, null=True)
     date = models.DateTimeField()
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=currency_choices, default="UZS")
 
     def __str__(self):
         return f"User: {self.user} | Amout: {self.amount} | Date: {self.date}"
 
     class Meta:
+        abstract = True
         ordering = ["-date"]
+        # Per-user lookups, and the admin's newest-first changelist
+        indexes = [
+            models.Index(fields=["user", "date"]),
+            models.Index(fields=["date"]),
+        ]
+
+
+class Transaction(TransactionRecord):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="transactions"
+    )
+
+    class Meta(TransactionRecord.Meta):
         verbose_name_plural = "Transactions"
 
 
+class ArchivedTransaction(TransactionRecord):
+    """
+    Transaction older than ARCHIVE_AFTER_DAYS, moved by the archive_records
+    command, see api.archive.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_transactions"
+    )
+
+    class Meta(TransactionRecord.Meta):
+        verbose_name_plural = "Archived transactions"
+
+
 class Account(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="accounts")
     account_type = models.CharField(max_length=50, choices=account_choices)
-    account_number = models.CharField(max_length=20)
+    # Indexed for the admin's prefix search, see LargeTableAdmin
+    account_number = models.CharField(max_length=20, db_index=True)
     balance = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=currency_choices, default="UZS")
     organization_name = models.CharField(max_length=100)
 
     def __str__(self):
@@ -68,7 +134,8 @@ class Account(models.Model):
 
 class Bill(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bills")
-    title = models.CharField(max_length=100)
+    # Indexed for the admin's prefix search, see LargeTableAdmin
+    title = models.CharField(max_length=100, db_index=True)
     description = models.TextField(blank=True, null=True)
     due_date = models.DateField()
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -82,24 +149,102 @@ class Bill(models.Model):
         ordering = ["-due_date"]
 
 
-class Expense(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="expenses")
+class ExpenseRecord(models.Model):
     category = models.CharField(max_length=50, choices=category_choices)
-    title = models.CharField(max_length=100)
+    # Indexed for the admin's prefix search, see LargeTableAdmin
+    title = models.CharField(max_length=100, db_index=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=currency_choices, default="UZS")
     date = models.DateField()
+    # Standard deviations above the category's rolling mean of the expenses
+    # recorded before it, null until the category has enough history, see
+    # api.anomalies
+    anomaly_score = models.FloatField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return f"User: {self.user} | Title: {self.title} | Amount: {self.amount} | Date: {self.date}"
 
     class Meta:
-        verbose_name_plural = "Expenses"
+        abstract = True
         ordering = ["-date"]
+        # Per-user lookups, and the admin's newest-first changelist
+        indexes = [
+            models.Index(fields=["user", "date"]),
+            models.Index(fields=["date"]),
+        ]
+
+
+class Expense(ExpenseRecord):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="expenses")
+
+    def save(self, *args, **kwargs):
+        from .anomalies import observe_expense, previous_observation, rescore_expense
+
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding and update_fields is not None:
+            if not {"category", "amount", "currency"} & set(update_fields):
+                return super().save(*args, **kwargs)
+
+        with transaction.atomic(using=kwargs.get("using")):
+            if self._state.adding:
+                observe_expense(self)
+            else:
+                previous = previous_observation(self)
+                if previous is not None:
+                    rescore_expense(self, previous)
+            super().save(*args, **kwargs)
+
+    class Meta(ExpenseRecord.Meta):
+        verbose_name_plural = "Expenses"
+
+
+class ArchivedExpense(ExpenseRecord):
+    """
+    Expense older than ARCHIVE_AFTER_DAYS, moved by the archive_records
+    command, see api.archive.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_expenses"
+    )
+
+    class Meta(ExpenseRecord.Meta):
+        verbose_name_plural = "Archived expenses"
+
+
+class CategoryStatistics(models.Model):
+    """
+    Exponentially weighted mean and variance of a user's expense amounts in
+    one category, in the order the expenses were recorded (by id), updated
+    as expenses are created. Edits and deletes mark the statistics stale
+    until rebuild_category_statistics replays them.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="category_statistics"
+    )
+    category = models.CharField(max_length=50, choices=category_choices)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    variance = models.FloatField(default=0)
+    stale = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"User: {self.user} | Category: {self.category} | Mean: {self.mean:.2f}"
+
+    class Meta:
+        verbose_name_plural = "Category statistics"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category"], name="unique_category_statistics"
+            )
+        ]
 
 
 class Goal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="goals")
-    category = models.CharField(max_length=50, choices=category_choices)
+    # Indexed for the admin's search, see CategoryGoalAdmin
+    category = models.CharField(max_length=50, choices=category_choices, db_index=True)
     target_amount = models.DecimalField(max_digits=10, decimal_places=2)
     achieved_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     start_date = models.DateField()
@@ -126,3 +271,73 @@ class MainGoal(models.Model):
     class Meta:
         verbose_name_plural = "Main Goals"
         ordering = ["start_date"]
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Precomputed dashboard charts of a user, covering data dated before
+    ``as_of``, see api.dashboards.
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="dashboard_snapshot"
+    )
+    as_of = models.DateField()
+    data = models.JSONField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"User: {self.user} | As of: {self.as_of}"
+
+    class Meta:
+        verbose_name_plural = "Dashboard snapshots"
+
+
+class ExchangeRate(models.Model):
+    """
+    Value of one unit of ``currency`` in FX_REFERENCE_CURRENCY on ``date``,
+    loaded with the load_exchange_rates command, see api.currency.
+    """
+
+    currency = models.CharField(max_length=3, choices=currency_choices)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    def __str__(self):
+        return f"Currency: {self.currency} | Rate: {self.rate} | Date: {self.date}"
+
+    class Meta:
+        verbose_name_plural = "Exchange rates"
+        ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["currency", "date"], name="unique_exchange_rate"
+            )
+        ]
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Response to a create request sent with an ``Idempotency-Key`` header,
+    replayed when the client retries the request, see api.idempotency.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="idempotency_records"
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.BinaryField(max_length=32)
+    status_code = models.PositiveSmallIntegerField()
+    body = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"User: {self.user} | Key: {self.key} | Status: {self.status_code}"
+
+    class Meta:
+        verbose_name_plural = "Idempotency records"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key"
+            )
+        ]
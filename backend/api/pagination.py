@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework.pagination import PageNumberPagination
+
+
+class PageSizePagination(PageNumberPagination):
+    """
+    Page number pagination that lets clients pick ``page_size``, up to the
+    ``MAX_PAGE_SIZE`` of the REST_FRAMEWORK settings.
+    """
+
+    page_size_query_param = "page_size"
+    max_page_size = settings.REST_FRAMEWORK.get("MAX_PAGE_SIZE")
@@ -0,0 +1,169 @@
+import threading
+import time
+from functools import partial
+
+from django.db import OperationalError
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of raw DB-API connections for one database alias.
+
+    At most ``size`` connections are open at once; ``acquire`` waits up to
+    ``timeout`` seconds for one to be released. Idle connections older than
+    ``max_age`` seconds are closed instead of being reused.
+    """
+
+    def __init__(self, size, timeout, max_age=None):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.idle = []  # (connection, opened at)
+        self.opened_at = {}
+        self.in_use = 0
+        self.condition = threading.Condition()
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+
+    def acquire(self, connect):
+        """
+        Return ``(connection, reused)``, opening a new connection with
+        ``connect()`` when none is idle and the pool is not full.
+        """
+        with self.condition:
+            if not self.idle and self.in_use >= self.size:
+                self.waits += 1
+                started = time.monotonic()
+                available = self.condition.wait_for(
+                    lambda: self.idle or self.in_use < self.size, self.timeout
+                )
+                self.wait_time += time.monotonic() - started
+                if not available:
+                    self.timeouts += 1
+                    raise OperationalError(
+                        f"No database connection available within {self.timeout}s "
+                        f"({self.size} in use)."
+                    )
+            while self.idle:
+                connection = self.idle.pop()
+                if self.expired(connection):
+                    self.close(connection)
+                    continue
+                self.in_use += 1
+                return connection, True
+            self.in_use += 1
+
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.created += 1
+            self.opened_at[id(connection)] = time.monotonic()
+        return connection, False
+
+    def release(self, connection):
+        with self.condition:
+            self.in_use -= 1
+            if self.expired(connection):
+                self.close(connection)
+            else:
+                self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        with self.condition:
+            self.in_use -= 1
+            self.close(connection)
+            self.condition.notify()
+
+    def expired(self, connection):
+        if self.max_age is None:
+            return False
+        return time.monotonic() - self.opened_at[id(connection)] > self.max_age
+
+    def close(self, connection):
+        # Called with the condition held
+        self.opened_at.pop(id(connection), None)
+        self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                "waits": self.waits,
+                "wait_time": round(self.wait_time, 3),
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "discarded": self.discarded,
+            }
+
+
+def get_pool(alias, settings_dict):
+    with pools_lock:
+        if alias not in pools:
+            options = settings_dict.get("POOL", {})
+            pools[alias] = ConnectionPool(
+                size=options.get("SIZE", 10),
+                timeout=options.get("TIMEOUT", 5),
+                max_age=options.get("MAX_AGE"),
+            )
+        return pools[alias]
+
+
+def pool_stats():
+    with pools_lock:
+        return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Borrow connections from a ConnectionPool instead of opening new ones,
+    and return them to it when Django closes the connection.
+    """
+
+    def get_new_connection(self, conn_params):
+        pool = get_pool(self.alias, self.settings_dict)
+        connect = partial(super().get_new_connection, conn_params)
+        while True:
+            connection, reused = pool.acquire(connect)
+            if not reused or not self.settings_dict["CONN_HEALTH_CHECKS"]:
+                return connection
+            if self.is_pooled_connection_usable(connection):
+                return connection
+            pool.discard(connection)
+
+    def is_pooled_connection_usable(self, connection):
+        previous, self.connection = self.connection, connection
+        try:
+            return self.is_usable()
+        finally:
+            self.connection = previous
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = get_pool(self.alias, self.settings_dict)
+        try:
+            # Never hand out a connection with an open transaction
+            with self.wrap_database_errors:
+                self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
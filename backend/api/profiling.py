@@ -0,0 +1,143 @@
+import cProfile
+import json
+import re
+import time
+import traceback
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from .queries import QueryRecorder, fingerprint, project_stack
+
+ARTIFACT_NAME = re.compile(r"[0-9a-f]{32}\.(prof|sql\.json)")
+
+
+def profiling_requested(request):
+    return "HTTP_X_PROFILE" in request.META or "profile" in request.GET
+
+
+def is_staff(request):
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class TimedQueryRecorder(QueryRecorder):
+    """
+    QueryRecorder also keeping the alias, parameters and duration of each
+    statement.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.details = []
+
+    def __call__(self, execute, sql, params, many, context):
+        stack = project_stack()[:-1]
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, stack))
+            self.details.append(
+                (context["connection"].alias, params, many, time.perf_counter() - start)
+            )
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+            return "\n".join(
+                " ".join(str(value) for value in row) for row in cursor.fetchall()
+            )
+    except DatabaseError as error:
+        return f"EXPLAIN failed: {error}"
+
+
+def sql_report(recorder):
+    """
+    The statements of ``recorder`` with their timings and the stack that ran
+    them, and the plan of the first run of every distinct SELECT.
+    """
+    explained = set()
+    queries = []
+    for (sql, stack), (alias, params, many, duration) in zip(
+        recorder.queries, recorder.details
+    ):
+        query = {
+            "alias": alias,
+            "sql": sql,
+            "params": params,
+            "milliseconds": round(duration * 1000, 3),
+            "stack": [line.rstrip() for line in traceback.format_list(stack)],
+        }
+        key = (alias, fingerprint(sql))
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            if key not in explained:
+                explained.add(key)
+                query["explain"] = explain(alias, sql, params)
+        queries.append(query)
+    return queries
+
+
+def prune_artifacts(directory):
+    """
+    Delete the artifacts of all but the latest PROFILE_KEEP profiles.
+    """
+    artifacts = sorted(
+        (path for path in directory.iterdir() if ARTIFACT_NAME.fullmatch(path.name)),
+        key=lambda path: path.stat().st_mtime_ns,
+        reverse=True,
+    )
+    # Two artifacts per profile
+    for path in artifacts[settings.PROFILE_KEEP * 2 :]:
+        path.unlink(missing_ok=True)
+
+
+def profile_request(request, get_response):
+    """
+    Run the request under cProfile, recording its SQL, and save both as
+    artifacts in PROFILE_DIR. Their URLs are returned in ``X-Profile`` and
+    ``X-Profile-SQL`` headers.
+    """
+    profile_id = uuid.uuid4().hex
+    profiler = cProfile.Profile()
+    with TimedQueryRecorder() as recorder:
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+
+    directory = Path(settings.PROFILE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(directory / f"{profile_id}.prof")
+    report = {
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "seconds": round(elapsed, 6),
+        "query_seconds": round(sum(detail[3] for detail in recorder.details), 6),
+        "queries": sql_report(recorder),
+    }
+    with open(directory / f"{profile_id}.sql.json", "w") as file:
+        json.dump(report, file, indent=2, default=str)
+
+    prune_artifacts(directory)
+
+    for header, name in [("X-Profile", "prof"), ("X-Profile-SQL", "sql.json")]:
+        response[header] = reverse(
+            "profile-artifact", kwargs={"name": f"{profile_id}.{name}"}
+        )
+    return response
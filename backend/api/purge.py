@@ -0,0 +1,127 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .images import delete_photo_variants
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def dependents(model):
+    """
+    ``(related model, field name)`` of the rows deleted with a ``model`` row,
+    including the rows of its many-to-many tables.
+    """
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.CASCADE and not relation.many_to_many:
+            yield relation.related_model, relation.field.name
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        if through._meta.auto_created:
+            yield through, field.m2m_field_name()
+
+
+def delete_in_batches(queryset, batch_size, progress=None):
+    """
+    Delete the rows of ``queryset`` ``batch_size`` at a time, each batch in
+    its own transaction. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by().values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            batch = model.objects.filter(pk__in=pks)
+            if any(dependents(model)):
+                # Rows referenced by other tables go through the collector
+                batch.delete()
+            else:
+                batch._raw_delete(batch.db)
+        deleted += len(pks)
+        if progress is not None:
+            progress(model, deleted)
+
+
+def request_purge(user):
+    """
+    Deactivate the user, revoke their tokens and mark them for purging, so
+    that purge_users resumes an interrupted purge.
+    """
+    User.objects.filter(pk=user.pk).update(
+        is_active=False, purge_requested_at=timezone.now()
+    )
+    Token.objects.filter(user=user).delete()
+
+
+def purge_user(user_id, batch_size=None, progress=None):
+    """
+    Delete a user and every row that references them in bounded batches of
+    set-based deletes, without loading them into memory. Returns the number
+    of rows deleted per model label. Safe to run again after an interruption.
+    """
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return {}
+
+    counts = {}
+    for model, field in dependents(User):
+        counts[model._meta.label] = delete_in_batches(
+            model.objects.filter(**{field: user_id}), batch_size, progress
+        )
+
+    # The default photo and its variants are shared by many users
+    if user.photo.name != User._meta.get_field("photo").default:
+        delete_photo_variants(user.photo_variants)
+        default_storage.delete(user.photo.name)
+    # Nothing references the user any more, so the collector has little to do
+    counts[User._meta.label] = User.objects.filter(pk=user_id).delete()[0]
+    return counts
+
+
+def purge_in_background(user_id):
+    close_old_connections()
+    try:
+        counts = purge_user(user_id)
+        logger.info("Purged user %s: %s", user_id, counts)
+    except Exception:
+        logger.exception("Could not purge user %s, purge_users will resume", user_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global executor
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(settings.PURGE_WORKERS, "purge")
+        return executor
+
+
+def schedule_purge(user):
+    """
+    Mark the user for purging and purge them once the current transaction
+    commits, on a background thread unless PURGE_WORKERS is 0.
+    """
+    request_purge(user)
+    user_id = user.pk
+
+    def purge():
+        if settings.PURGE_WORKERS:
+            get_executor().submit(purge_in_background, user_id)
+        else:
+            purge_user(user_id)
+
+    transaction.on_commit(purge)
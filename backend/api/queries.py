@@ -0,0 +1,77 @@
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+PLACEHOLDER_LISTS = re.compile(r"%s(?:\s*,\s*%s)+")
+NUMBERS = re.compile(r"\b\d+\b")
+
+
+def fingerprint(sql):
+    """
+    ``sql`` with its numbers and ``IN`` lists of any length made alike, so
+    the statements a loop runs once per row compare equal.
+    """
+    return NUMBERS.sub("N", PLACEHOLDER_LISTS.sub("%s, ...", sql))
+
+
+def project_stack():
+    # The frames of project code that led to the query, innermost last
+    base_dir = str(settings.BASE_DIR)
+    return [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+
+
+class QueryRecorder:
+    """
+    Records the statements run on every database connection while in use,
+    with the project frames that ran each of them.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, project_stack()))
+        return execute(sql, params, many, context)
+
+    def counts(self):
+        return Counter(fingerprint(sql) for sql, _ in self.queries)
+
+    def repeated(self, threshold):
+        """
+        ``(count, sql, stack)`` of the statements run at least ``threshold``
+        times, most repeated first.
+        """
+        counts = self.counts()
+        first = {}
+        for sql, stack in self.queries:
+            first.setdefault(fingerprint(sql), (sql, stack))
+        return [
+            (count, *first[key])
+            for key, count in counts.most_common()
+            if count >= threshold
+        ]
+
+
+def format_query(count, sql, stack):
+    lines = [f"{count} x {sql}"]
+    lines += traceback.format_list(stack)
+    return "\n".join(line.rstrip() for line in lines)
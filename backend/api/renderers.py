@@ -0,0 +1,102 @@
+import decimal
+import math
+import re
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+ORJSON_OPTIONS = 0
+ORJSON_FRAGMENT = None
+if orjson is not None:
+    ORJSON_OPTIONS = (
+        orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME
+        | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+    # orjson >= 3.9 can embed pre-serialized JSON, which lets us reuse the
+    # exact float formatting of the stdlib for Decimal values.
+    ORJSON_FRAGMENT = getattr(orjson, "Fragment", None)
+
+# A number in exponent form, which orjson writes differently from the stdlib
+# ("1e-7" and "1e16" for "1e-07" and "1e+16"). Strings that look alike only
+# cost a fallback.
+EXPONENT = re.compile(rb"[:,\[]-?[0-9]+(?:\.[0-9]+)?e[-+]?[0-9]")
+
+
+def has_non_finite(data):
+    """
+    Whether ``data`` holds a NaN or infinite float, which orjson writes as
+    null where the strict stdlib encoder raises ValueError.
+    """
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, float) and not math.isfinite(value):
+            return True
+    return False
+
+
+class FastJSONEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, decimal.Decimal) and not obj.is_finite():
+            # Like the strict stdlib encoder, raised back from orjson as a
+            # TypeError so that rendering falls back to it
+            raise ValueError("Out of range float values are not JSON compliant")
+        if isinstance(obj, decimal.Decimal) and ORJSON_FRAGMENT is not None:
+            return ORJSON_FRAGMENT(repr(float(obj)))
+        return super().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson.
+
+    The output is byte-identical to JSONRenderer. Whenever orjson is missing
+    or the request needs a feature orjson cannot reproduce exactly (indented
+    output, ASCII escaping, non-compact separators or NaN support), rendering
+    falls back to the stdlib implementation. So it does for data orjson
+    formats differently: numbers in exponent form, and NaN or infinite
+    floats, which orjson writes as null where JSONRenderer raises
+    ValueError.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=FastJSONEncoder().default, option=ORJSON_OPTIONS
+            )
+        except TypeError:
+            # Unsupported types (e.g. integers wider than 64 bits)
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if EXPONENT.search(ret) or (b"null" in ret and has_non_finite(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match JSONRenderer, which always escapes \u2028 and \u2029
+        if b"\xe2\x80" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
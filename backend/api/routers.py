@@ -0,0 +1,59 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Per-request routing state, set by ReplicaRoutingMiddleware
+routing_state = ContextVar("routing_state", default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+        # Credentials handed out by the request, see pin_credentials()
+        self.issued = []
+
+
+def pin_credentials(authorization):
+    """
+    Pin the client that will send ``authorization``, e.g. a token returned
+    by a login, to the primary along with the credentials of this request.
+    """
+    state = routing_state.get()
+    if state is not None:
+        state.issued.append(authorization)
+
+
+def choose_replica():
+    replicas = getattr(settings, "DATABASE_REPLICAS", [])
+    return random.choice(replicas) if replicas else None
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a read replica when the current request allows it.
+
+    Outside of a request, for writes, and for every read that follows a
+    write in the same request, the primary database is used.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing_state.get()
+        if state is None or state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -1,11 +1,20 @@
+import datetime
+import decimal
+import operator
+import re
+
+from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth import authenticate
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.files.storage import default_storage
 
 from rest_framework.serializers import ModelSerializer
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
+from .hashing import authenticate, hash_password, verify_password
+from .images import delete_photo_variants, schedule_profile_photo
 from .models import User, Transaction, Account, Bill, Expense, Goal, MainGoal
 
 
@@ -34,6 +43,10 @@ class RegisterSerializer(ModelSerializer):
 
         return data
 
+    def create(self, validated_data):
+        validated_data["password"] = hash_password(validated_data["password"])
+        return super().create(validated_data)
+
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
@@ -41,6 +54,7 @@ class LoginSerializer(serializers.Serializer):
 
     def validate(self, data):
         # Attempt to authenticate the user directly without checking existence separately
+        # (password hashing runs on the bounded hashing pool)
         user = authenticate(username=data["username"], password=data["password"])
         if not user:
             # Raise a general error without specifying if the username or password was incorrect
@@ -51,6 +65,8 @@ class LoginSerializer(serializers.Serializer):
 
 
 class ProfileSerializer(ModelSerializer):
+    photo_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = [
@@ -61,10 +77,25 @@ class ProfileSerializer(ModelSerializer):
             "last_name",
             "date_joined",
             "phone_number",
+            "base_currency",
             "photo",
+            "photo_variants",
         ]
         read_only_fields = ["id", "username", "email", "date_joined"]
 
+    def get_photo_variants(self, user):
+        # Filled in by the image pipeline shortly after an upload
+        request = self.context.get("request")
+        variants = {}
+        for size, formats in user.photo_variants.items():
+            variants[size] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[size][image_format] = url
+        return variants
+
     def validate(self, data):
         if data.get("phone_number") and not data["phone_number"].isdigit():
             raise ValidationError(
@@ -76,22 +107,50 @@ class ProfileSerializer(ModelSerializer):
             )
         return data
 
+    def update(self, instance, validated_data):
+        if "photo" not in validated_data:
+            return super().update(instance, validated_data)
+
+        # The variants of the default photo are shared by many users
+        if instance.photo.name != User._meta.get_field("photo").default:
+            delete_photo_variants(instance.photo_variants)
+        validated_data["photo_variants"] = {}
+        instance = super().update(instance, validated_data)
+        schedule_profile_photo(instance)
+        return instance
+
 
 class PasswordChangeSerializer(serializers.Serializer):
     old_password = serializers.CharField(style={"input_type": "password"})
     new_password = serializers.CharField(style={"input_type": "password"})
 
+    def validate_old_password(self, value):
+        is_correct, _ = verify_password(value, self.instance.password)
+        if not is_correct:
+            raise ValidationError("Old password is incorrect.")
+        return value
+
     def validate(self, data):
         # Validate new password strength
-        validate_password(data["new_password"])
+        validate_password(data["new_password"], self.instance)
         return data
 
     def update(self, instance, validated_data):
-        instance.set_password(validated_data["new_password"])
-        instance.save()
+        instance.password = hash_password(validated_data["new_password"])
+        instance.save(update_fields=["password"])
         return instance
 
 
+class AccountDeleteSerializer(serializers.Serializer):
+    password = serializers.CharField(style={"input_type": "password"})
+
+    def validate_password(self, value):
+        is_correct, _ = verify_password(value, self.instance.password)
+        if not is_correct:
+            raise ValidationError("Password is incorrect.")
+        return value
+
+
 class PasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
@@ -101,7 +160,29 @@ class PasswordResetSerializer(serializers.Serializer):
         return data
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class BatchRequestSerializer(serializers.Serializer):
+    path = serializers.CharField(max_length=2000)
+    params = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchRequestSerializer(
+        many=True, min_length=1, max_length=settings.BATCH_MAX_REQUESTS
+    )
+
+
+class DefaultCurrencyMixin:
+    """
+    For serializers of rows with a currency: new rows default to the
+    currency of their user.
+    """
+
+    def default_currency(self, data):
+        if self.instance is None:
+            data.setdefault("currency", data["user"].base_currency)
+
+
+class TransactionSerializer(DefaultCurrencyMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     # Custom date and time formatting
@@ -110,7 +191,16 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
-        fields = ["id", "title", "amount", "date", "time", "shop_name", "user"]
+        fields = [
+            "id",
+            "title",
+            "amount",
+            "currency",
+            "date",
+            "time",
+            "shop_name",
+            "user",
+        ]
 
     def validate(self, data):
         # Validate user
@@ -118,6 +208,7 @@ class TransactionSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"user": "You can only create transactions for yourself."}
             )
+        self.default_currency(data)
 
         # Validate title
         if not data.get("title"):
@@ -138,7 +229,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         return data
 
 
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(DefaultCurrencyMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
@@ -148,6 +239,7 @@ class AccountSerializer(serializers.ModelSerializer):
             "account_type",
             "account_number",
             "balance",
+            "currency",
             "organization_name",
             "user",
         ]
@@ -158,6 +250,7 @@ class AccountSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"user": "You can only create accounts for yourself."}
             )
+        self.default_currency(data)
 
         # Validate account number
         if not data.get("account_number"):
@@ -221,12 +314,12 @@ class BillSerializer(serializers.ModelSerializer):
         return data
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(DefaultCurrencyMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = Expense
-        fields = ["id", "category", "title", "amount", "date", "user"]
+        fields = ["id", "category", "title", "amount", "currency", "date", "user"]
 
     def validate(self, data):
         # Validate user
@@ -234,6 +327,7 @@ class ExpenseSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"user": "You can only create expenses for yourself."}
             )
+        self.default_currency(data)
 
         # Validate title
         if not data.get("title"):
@@ -252,6 +346,11 @@ class ExpenseSerializer(serializers.ModelSerializer):
         return data
 
 
+class ExpenseAnomalySerializer(ExpenseSerializer):
+    class Meta(ExpenseSerializer.Meta):
+        fields = ExpenseSerializer.Meta.fields + ["anomaly_score"]
+
+
 class GoalSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
@@ -323,3 +422,225 @@ class MainGoalSerializer(serializers.ModelSerializer):
             )
 
         return data
+
+
+class ValuesSerializer:
+    """
+    Read-only version of a ModelSerializer for list responses.
+
+    Produces the same output as ``serializer_class(queryset, many=True).data``
+    but reads plain tuples with ``values_list()`` and formats them with
+    converters compiled from the serializer's readable fields, skipping model
+    instantiation and the per-field ``to_representation`` machinery.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._columns = None
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = self.compile()
+        return self._columns
+
+    def compile(self):
+        model = self.serializer_class.Meta.model
+        columns = []
+        for field in self.serializer_class().fields.values():
+            if field.write_only:
+                continue
+            if field.source == "*" or not isinstance(field, VALUES_SERIALIZER_FIELDS):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{field.field_name} "
+                    "cannot be read from values()."
+                )
+            lookup = "__".join(field.source_attrs)
+            nullable = True
+            if len(field.source_attrs) == 1:
+                nullable = model._meta.get_field(lookup).null
+            columns.append((field, lookup, nullable))
+        return columns
+
+    def serialize(self, queryset, key=None):
+        """
+        With ``key``, a lookup, returns ``(value, row)`` pairs carrying the raw
+        value of that lookup next to each formatted row.
+        """
+        lookups = list(dict.fromkeys(lookup for _, lookup, _ in self.columns))
+        if key is not None and key not in lookups:
+            lookups.append(key)
+        # Formatters are built per call since datetime output depends on the
+        # active timezone
+        formatters = []
+        for field, lookup, nullable in self.columns:
+            formatter = make_formatter(field)
+            if nullable:
+                formatter = skip_none(formatter)
+            formatters.append((field.field_name, lookups.index(lookup), formatter))
+
+        rows = queryset.values_list(*lookups)
+        if key is not None:
+            key_index = lookups.index(key)
+            return [
+                (
+                    row[key_index],
+                    {
+                        name: formatter(row[index])
+                        for name, index, formatter in formatters
+                    },
+                )
+                for row in rows
+            ]
+        return [
+            {name: formatter(row[index]) for name, index, formatter in formatters}
+            for row in rows
+        ]
+
+
+VALUES_SERIALIZER_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.DateField,
+    serializers.DateTimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.IntegerField,
+)
+
+
+STRFTIME_DIRECTIVES = {
+    "d": ("%02d", "day"),
+    "m": ("%02d", "month"),
+    "Y": ("%04d", "year"),
+    "H": ("%02d", "hour"),
+    "M": ("%02d", "minute"),
+    "S": ("%02d", "second"),
+}
+
+
+def make_strftime(output_format):
+    """
+    Compile a strftime format made only of numeric directives into a
+    %-template, which formats several times faster than ``strftime``.
+    """
+    if not re.fullmatch(r"(?:[^%]|%[dmYHMS%])*", output_format):
+        return lambda value: value.strftime(output_format)
+
+    template, attrs = [], []
+    for literal, directive in re.findall(r"([^%]*)(%.|$)", output_format):
+        template.append(literal)
+        if directive == "%%":
+            template.append("%%")
+        elif directive:
+            conversion, attr = STRFTIME_DIRECTIVES[directive[1]]
+            template.append(conversion)
+            attrs.append(attr)
+    template = "".join(template)
+    if not attrs:
+        return lambda value: value.strftime(output_format)
+    getter = operator.attrgetter(*attrs)
+
+    def strftime(value):
+        # strftime does not zero-pad years before 1000 on every platform
+        if value.year < 1000:
+            return value.strftime(output_format)
+        return template % getter(value)
+
+    return strftime
+
+
+def skip_none(formatter):
+    return lambda value: None if value is None else formatter(value)
+
+
+def make_formatter(field):
+    fallback = field.to_representation
+
+    if isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(
+            field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING
+        )
+        if (
+            not coerce_to_string
+            or field.localize
+            or field.normalize_output
+            or field.decimal_places is None
+        ):
+            return fallback
+        exponent = decimal.Decimal(".1") ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+        rounding = field.rounding
+
+        def format_decimal(value):
+            if value.__class__ is not decimal.Decimal:
+                return fallback(value)
+            return "{:f}".format(
+                value.quantize(exponent, rounding=rounding, context=context)
+            )
+
+        return format_decimal
+
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        field_timezone = (
+            field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        )
+        if output_format is None or field_timezone is None:
+            return fallback
+        iso_8601 = output_format.lower() == ISO_8601
+        strftime = make_strftime(output_format)
+
+        def format_datetime(value):
+            if value.__class__ is not datetime.datetime or value.tzinfo is None:
+                return fallback(value)
+            value = value.astimezone(field_timezone)
+            if iso_8601:
+                value = value.isoformat()
+                if value.endswith("+00:00"):
+                    value = value[:-6] + "Z"
+                return value
+            return strftime(value)
+
+        return format_datetime
+
+    if isinstance(field, serializers.DateField):
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if output_format is None:
+            return fallback
+        if output_format.lower() == ISO_8601:
+            return lambda value: (
+                value.isoformat()
+                if value.__class__ is datetime.date
+                else fallback(value)
+            )
+        strftime = make_strftime(output_format)
+        return lambda value: (
+            strftime(value) if value.__class__ is datetime.date else fallback(value)
+        )
+
+    if isinstance(field, serializers.ChoiceField):
+        choices = field.choice_strings_to_values
+        return lambda value: (value if value == "" else choices.get(str(value), value))
+
+    # Values already coming back from the database with the represented type
+    passthrough = {
+        serializers.BooleanField: bool,
+        serializers.CharField: str,
+        serializers.FloatField: float,
+        serializers.IntegerField: int,
+    }.get(field.__class__)
+    if passthrough is None:
+        return fallback
+    return lambda value: value if value.__class__ is passthrough else fallback(value)
+
+
+TransactionValuesSerializer = ValuesSerializer(TransactionSerializer)
+AccountValuesSerializer = ValuesSerializer(AccountSerializer)
+BillValuesSerializer = ValuesSerializer(BillSerializer)
+ExpenseValuesSerializer = ValuesSerializer(ExpenseSerializer)
+ExpenseAnomalyValuesSerializer = ValuesSerializer(ExpenseAnomalySerializer)
+GoalValuesSerializer = ValuesSerializer(GoalSerializer)
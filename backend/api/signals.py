@@ -0,0 +1,111 @@
+import weakref
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .anomalies import mark_stale
+from .dashboards import CATEGORIES, category_totals
+from .events import publish
+from .models import (
+    Account,
+    DashboardSnapshot,
+    ExchangeRate,
+    Expense,
+    Goal,
+    Transaction,
+    User,
+)
+from .serializers import TransactionSerializer
+
+
+@receiver(post_save, sender=Expense)
+def expense_saved(sender, instance, created, **kwargs):
+    # Snapshots only merge in expenses dated on or after their as_of day
+    snapshots = DashboardSnapshot.objects.filter(user_id=instance.user_id)
+    if created:
+        snapshots = snapshots.filter(as_of__gt=instance.date)
+    snapshots.delete()
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+def expense_or_goal_changed(sender, instance, **kwargs):
+    DashboardSnapshot.objects.filter(user_id=instance.user_id).delete()
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def exchange_rate_changed(sender, instance, **kwargs):
+    # Snapshots hold totals converted at the latest rates
+    DashboardSnapshot.objects.all().delete()
+
+
+# The categories marked stale for each delete, as a queryset delete sends
+# post_delete for every expense once they are all gone
+marked = weakref.WeakKeyDictionary()
+
+
+@receiver(post_delete, sender=Expense)
+def mark_deleted_expense_category(sender, instance, origin=None, **kwargs):
+    # Statistics are deleted along with their user
+    if isinstance(origin, User):
+        return
+    key = instance.user_id, instance.category
+    try:
+        seen = marked.setdefault(origin, set())
+    except TypeError:
+        seen = set()
+    if key not in seen:
+        seen.add(key)
+        mark_stale(instance.user_id, [instance.category])
+
+
+def publish_category_totals(expense, categories):
+    today = timezone.now().date()
+    publish(
+        expense.user_id,
+        lambda: {
+            "type": "categories",
+            "data": category_totals(expense.user_id, today, categories),
+        },
+    )
+
+
+@receiver(post_save, sender=Expense)
+def publish_expense_saved(sender, instance, created, **kwargs):
+    # An update may have moved the expense out of another category
+    publish_category_totals(instance, [instance.category] if created else CATEGORIES)
+
+
+@receiver(post_delete, sender=Expense)
+def publish_expense_deleted(sender, instance, **kwargs):
+    publish_category_totals(instance, [instance.category])
+
+
+@receiver(post_save, sender=Transaction)
+def publish_transaction_saved(sender, instance, created, **kwargs):
+    publish(
+        instance.user_id,
+        lambda: {
+            "type": "transaction",
+            "action": "created" if created else "updated",
+            "data": TransactionSerializer(instance).data,
+        },
+    )
+
+
+@receiver(post_save, sender=Account)
+def publish_account_saved(sender, instance, **kwargs):
+    publish(
+        instance.user_id,
+        lambda: {
+            "type": "account",
+            "data": {
+                "id": instance.pk,
+                "balance": instance.balance,
+                "currency": instance.currency,
+            },
+        },
+    )
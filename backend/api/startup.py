@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Run in a fresh interpreter: load the application and resolve the URLconf as
+# a worker does before serving its first request, then report the time taken,
+# peak RSS and the modules loaded. __import__ rather than importlib, which
+# -X importtime does not report
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1])
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    "seconds": time.perf_counter() - started,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+def measure_startup(module="backend.wsgi", importtime=False, env=None):
+    """
+    Cold start ``module`` in a subprocess. With ``importtime``, the result
+    also has ``imports``, the ``-X importtime`` entries as
+    ``(module, self_us, cumulative_us, depth)``.
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    result = subprocess.run(
+        [*command, "-c", PROBE, module],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    measurement = json.loads(result.stdout.splitlines()[-1])
+    if importtime:
+        measurement["imports"] = parse_importtime(result.stderr)
+    return measurement
+
+
+def parse_importtime(output):
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
@@ -0,0 +1,1520 @@
+import gzip
+import io
+import json
+import os
+import pstats
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import partial
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django import test
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import Count, Sum
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from . import events, urls
+from .backup import (
+    BACKUP_MODELS,
+    END,
+    MAGIC,
+    VERSION,
+    BackupError,
+    backup_chunks,
+    backup_columns,
+    encode_frame,
+    restore_backup,
+)
+from .currency import clear_exchange_rates, convert, converted, exchange_rates
+from .dashboards import store_snapshots
+from .events import get_broker, issue_ticket
+from .forecasting import fit, forecast_goals, month_index
+from .hashing import HashingPool, PasswordHashingBusy
+from .management.commands._sample_data import create_sample_rows
+from .memory import MEMORY_ENDPOINTS, measure_memory
+from .middleware import QueryInspectionMiddleware
+from .models import (
+    Account,
+    ArchivedExpense,
+    ArchivedTransaction,
+    Bill,
+    DashboardSnapshot,
+    Expense,
+    Goal,
+    IdempotencyRecord,
+    MainGoal,
+    Transaction,
+    User,
+)
+from .parsers import FastJSONParser
+from .pool import ConnectionPool
+from .purge import purge_user, request_purge
+from .queries import QueryRecorder, fingerprint, format_query
+from .renderers import FastJSONRenderer
+from .serializers import (
+    AccountSerializer,
+    AccountValuesSerializer,
+    BillSerializer,
+    BillValuesSerializer,
+    ExpenseSerializer,
+    ExpenseValuesSerializer,
+    GoalSerializer,
+    GoalValuesSerializer,
+    TransactionSerializer,
+    TransactionValuesSerializer,
+)
+from .startup import measure_startup
+from .throttling import SlidingWindowRateThrottle
+from .timeseries import by_year_and_month, time_series
+
+
+class CacheIsolationMixin:
+    """
+    Starts every test with an empty cache. Throttle counters live there, and
+    user ids repeat from one test to the next.
+    """
+
+    def _pre_setup(self):
+        super()._pre_setup()
+        cache.clear()
+
+
+class TestCase(CacheIsolationMixin, test.TestCase):
+    pass
+
+
+class TransactionTestCase(CacheIsolationMixin, test.TransactionTestCase):
+    pass
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_renderer_matches_json_renderer(self):
+        transaction = Transaction(
+            id=1,
+            user=User(username="test"),
+            title="Caf\u00e9 \u2028 run \u2029",
+            shop_name=None,
+            date=datetime(2024, 3, 9, 8, 5, 1, tzinfo=ZoneInfo("UTC")),
+            amount=Decimal("12.50"),
+        )
+        data = {
+            "transactions": TransactionSerializer([transaction], many=True).data,
+            "total_balance": Decimal("1234.56"),
+            "percentage_change": round(Decimal("33.3333"), 2),
+            "monthly": {2023: {"January": Decimal("0.10")}, 2024: {"March": 0}},
+            "date": date(2024, 3, 9),
+            "created": datetime(2024, 3, 9, 8, 5, 1, 250, tzinfo=ZoneInfo("UTC")),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renderer_matches_json_renderer_on_edge_numbers(self):
+        for data in [
+            {"a": 1e-7, "b": 1e16, "c": -2.5e300},
+            {"total": Decimal("1E+20"), "small": Decimal("0.00001")},
+            {"note": "1e5", "ids": [1, 2]},
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(
+                    FastJSONRenderer().render(data), JSONRenderer().render(data)
+                )
+        for value in [float("nan"), float("inf"), Decimal("NaN")]:
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({"a": [None, value]})
+
+    def test_renderer_honours_indent(self):
+        data = {"a": [1, 2]}
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_parser_matches_json_parser(self):
+        body = '{"title": "Café", "amount": 12.5, "ids": [1, 2], "note": null}'
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(body.encode())),
+            JSONParser().parse(io.BytesIO(body.encode())),
+        )
+
+
+class ValuesSerializerTests(TestCase):
+    def test_matches_model_serializers(self):
+        user = User.objects.create_user(username="test", password="secret")
+        create_sample_rows(user, 50)
+
+        cases = [
+            (user.transactions, TransactionSerializer, TransactionValuesSerializer),
+            (user.accounts, AccountSerializer, AccountValuesSerializer),
+            (user.bills, BillSerializer, BillValuesSerializer),
+            (user.expenses, ExpenseSerializer, ExpenseValuesSerializer),
+            (user.goals, GoalSerializer, GoalValuesSerializer),
+        ]
+        for manager, serializer_class, values_serializer in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertEqual(
+                    values_serializer.serialize(manager.all()),
+                    serializer_class(manager.all(), many=True).data,
+                )
+
+
+class TimeSeriesTests(TestCase):
+    def test_dense_series_for_each_granularity(self):
+        user = User.objects.create_user(username="test", password="secret")
+        Expense.objects.bulk_create(
+            Expense(user=user, category="food", title="x", amount=amount, date=day)
+            for amount, day in [
+                (Decimal("10.00"), date(2023, 1, 2)),
+                (Decimal("5.50"), date(2023, 1, 3)),
+                (Decimal("7.25"), date(2024, 12, 31)),
+                (Decimal("99.00"), date(2022, 6, 1)),
+            ]
+        )
+        measures = {"total": Sum("amount"), "count": Count("id")}
+        queryset = Expense.objects.filter(user=user)
+
+        months = time_series(queryset, "date", measures, [2023, 2024])
+        self.assertEqual(len(months["total"]), 24)
+        self.assertEqual(months["total"][date(2023, 1, 1)], Decimal("15.50"))
+        self.assertEqual(months["count"][date(2024, 12, 1)], 1)
+        self.assertEqual(months["total"][date(2023, 2, 1)], 0)
+
+        quarters = time_series(queryset, "date", measures, [2023, 2024], "quarter")
+        self.assertEqual(len(quarters["total"]), 8)
+        self.assertEqual(quarters["total"][date(2024, 10, 1)], Decimal("7.25"))
+
+        weeks = time_series(queryset, "date", measures, [2023], "week")
+        self.assertEqual(weeks["count"][date(2023, 1, 2)], 2)
+        self.assertEqual(sum(weeks["count"].values()), 2)
+
+        days = time_series(queryset, "date", measures, [2024], "day")
+        self.assertEqual(len(days["total"]), 366)
+
+        self.assertEqual(
+            list(by_year_and_month(months["total"], [2023, 2024])[2023])[:2],
+            ["January", "February"],
+        )
+
+
+@override_settings(
+    DATABASE_ROUTERS=["api.routers.ReplicaRouter"],
+    DATABASE_REPLICAS=["replica_test"],
+    MIDDLEWARE=["api.middleware.ReplicaRoutingMiddleware", *settings.MIDDLEWARE],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        # The test database is the primary, a second SQLite file the replica.
+        # It is registered after setUpClass so queries to it are allowed.
+        replica_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(replica_dir.cleanup)
+        connections.settings["replica_test"] = dict(
+            connections.settings["default"],
+            ENGINE=settings.DB_POOL_ENGINE,
+            NAME=os.path.join(replica_dir.name, "replica.sqlite3"),
+        )
+        self.addCleanup(connections.settings.pop, "replica_test")
+        self.addCleanup(connections.__delitem__, "replica_test")
+        self.addCleanup(connections["replica_test"].close)
+        with connections["replica_test"].schema_editor() as editor:
+            editor.create_model(User)
+            editor.create_model(Token)
+            editor.create_model(Transaction)
+
+        self.user = self.create_user("test")
+        self.client = self.token_client(self.user)
+
+    def create_user(self, username):
+        user = User.objects.create_user(username=username, password="secret")
+        token = Token.objects.create(user=user)
+        User.objects.using("replica_test").create(id=user.id, username=username)
+        Token.objects.using("replica_test").create(key=token.key, user_id=user.id)
+        return user
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {user.auth_token.key}")
+        return client
+
+    def create_transaction(self, using, title):
+        Transaction.objects.using(using).create(
+            user_id=self.user.id, title=title, date=timezone.now(), amount=1
+        )
+
+    def titles(self, client=None):
+        response = (client or self.client).get(reverse("transaction-list"))
+        return [transaction["title"] for transaction in response.data]
+
+    def test_reads_go_to_replica_until_client_writes(self):
+        self.create_transaction("default", "primary")
+        self.create_transaction("replica_test", "replica")
+        self.assertEqual(self.titles(), ["replica"])
+
+        response = self.client.post(
+            reverse("transaction-list"),
+            {
+                "title": "new",
+                "amount": "2.00",
+                "date": "2024-01-01T10:00:00Z",
+                "time": "2024-01-01T10:00:00Z",
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertCountEqual(self.titles(), ["primary", "new"])
+
+        cache.clear()
+        self.assertEqual(self.titles(), ["replica"])
+
+    def test_other_clients_at_the_same_address_keep_reading_replica(self):
+        other = self.create_user("other")
+        Transaction.objects.using("replica_test").create(
+            user_id=other.id, title="replica", date=timezone.now(), amount=1
+        )
+        Transaction.objects.create(
+            user_id=other.id, title="primary", date=timezone.now(), amount=1
+        )
+        response = self.client.post(
+            reverse("transaction-list"),
+            {
+                "title": "new",
+                "amount": "2.00",
+                "date": "2024-01-01T10:00:00Z",
+                "time": "2024-01-01T10:00:00Z",
+            },
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.titles(self.token_client(other)), ["replica"])
+
+    def test_login_pins_the_returned_token(self):
+        Token.objects.using("replica_test").all().delete()
+        self.user.auth_token.delete()
+        self.create_transaction("default", "primary")
+        self.create_transaction("replica_test", "replica")
+        response = APIClient().post(
+            reverse("login"), {"username": "test", "password": "secret"}
+        )
+        token = response.data["token"]
+        Token.objects.using("replica_test").create(key=token, user_id=self.user.id)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        self.assertEqual(self.titles(client), ["primary"])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.create_transaction("default", "primary")
+        self.assertEqual(Transaction.objects.get().title, "primary")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_reuses_waits_for_and_expires_connections(self):
+        connect = partial(sqlite3.connect, ":memory:")
+        pool = ConnectionPool(size=1, timeout=0.05, max_age=60)
+        first, reused = pool.acquire(connect)
+        self.assertFalse(reused)
+
+        with self.assertRaises(OperationalError):
+            pool.acquire(connect)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+        threading.Timer(0.01, pool.release, [first]).start()
+        pool.timeout = 1
+        second, reused = pool.acquire(connect)
+        self.assertIs(second, first)
+        self.assertTrue(reused)
+
+        pool.max_age = 0
+        pool.release(second)
+        third, reused = pool.acquire(connect)
+        self.assertFalse(reused)
+        pool.discard(third)
+        self.assertEqual(
+            {key: pool.stats()[key] for key in ("in_use", "idle", "waits", "created")},
+            {"in_use": 0, "idle": 0, "waits": 2, "created": 2},
+        )
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="test", password="secret")
+        )
+
+    def get_profile(self, now):
+        with mock.patch.object(SlidingWindowRateThrottle, "timer", return_value=now):
+            return self.client.get(reverse("profile"))
+
+    def test_burst_rate_is_enforced_with_sliding_window(self):
+        statuses = [self.get_profile(1000.2).status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+
+        # Halfway through the next second, half of the previous one still counts
+        for _ in range(3):
+            self.assertEqual(self.get_profile(1001.5).status_code, 200)
+        response = self.get_profile(1001.5)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+        self.assertEqual(self.get_profile(1003.0).status_code, 200)
+
+
+class UserTokenListTests(TestCase):
+    def test_lists_users_with_tokens_in_constant_queries(self):
+        admin = User.objects.create_superuser(username="admin", password="secret")
+        users = [User.objects.create_user(username=f"user{i}") for i in range(15)]
+        existing = Token.objects.create(user=users[0])
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        # Count, page of users with their tokens, token insert and read back
+        with self.assertNumQueries(4):
+            response = client.get(reverse("user-tokens"), {"page_size": 20})
+        self.assertEqual(response.data["count"], 16)
+        tokens = {row["username"]: row["token"] for row in response.data["results"]}
+        self.assertEqual(tokens["user0"], existing.key)
+        self.assertEqual(Token.objects.count(), 16)
+
+        with self.assertNumQueries(2):
+            response = client.get(reverse("user-tokens"), {"page_size": 20})
+        self.assertEqual(
+            {row["username"]: row["token"] for row in response.data["results"]},
+            tokens,
+        )
+
+    def test_requires_staff(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="test"))
+        self.assertEqual(client.get(reverse("user-tokens")).status_code, 403)
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class PasswordHashingTests(TestCase):
+    def test_login_upgrades_outdated_hashes(self):
+        user = User.objects.create_user(username="test", password="Secret-pass-1")
+        self.assertIn("$1000$", user.password)
+
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = APIClient().post(
+                reverse("login"), {"username": "test", "password": "Secret-pass-1"}
+            )
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertIn("$2000$", user.password)
+        self.assertTrue(user.check_password("Secret-pass-1"))
+
+    def test_register_and_change_password_store_hashes(self):
+        client = APIClient()
+        response = client.post(
+            reverse("register"),
+            {
+                "username": "new",
+                "email": "new@example.com",
+                "password": "Secret-pass-1",
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username="new")
+        self.assertTrue(user.check_password("Secret-pass-1"))
+
+        client.force_authenticate(user)
+        response = client.post(
+            reverse("password-change"),
+            {"old_password": "wrong", "new_password": "Other-pass-2"},
+        )
+        self.assertEqual(response.status_code, 400)
+        response = client.post(
+            reverse("password-change"),
+            {"old_password": "Secret-pass-1", "new_password": "Other-pass-2"},
+        )
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password("Other-pass-2"))
+
+    def test_pool_rejects_work_beyond_its_queue(self):
+        pool = HashingPool(workers=1, queue_size=1, timeout=5)
+        release = threading.Event()
+        running = []
+        for _ in range(2):
+            thread = threading.Thread(target=pool.run, args=(release.wait,))
+            thread.start()
+            running.append(thread)
+        while pool.slots._value:
+            time.sleep(0.001)
+
+        with self.assertRaises(PasswordHashingBusy):
+            pool.run(make_password, "secret")
+        release.set()
+        for thread in running:
+            thread.join()
+        self.assertTrue(pool.run(check_password, "x", make_password("x")))
+
+
+class ProfilePhotoTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(
+            override_settings(MEDIA_ROOT=media_root.name, IMAGE_PROCESSING_WORKERS=0)
+        )
+
+    def test_upload_creates_variants(self):
+        user = User.objects.create_user("photo", "photo@example.com", "x")
+        client = APIClient()
+        client.force_authenticate(user)
+        image = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(image, "JPEG")
+        image.name = "me.jpg"
+        image.seek(0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put(
+                reverse("profile"), {"photo": image}, format="multipart"
+            )
+        self.assertEqual(response.status_code, 200)
+
+        user.refresh_from_db()
+        self.assertEqual(set(user.photo_variants), {"thumbnail", "small", "medium"})
+        with default_storage.open(user.photo_variants["thumbnail"]["webp"]) as file:
+            self.assertEqual(Image.open(file).size, (96, 96))
+        response = client.get(reverse("profile"))
+        self.assertTrue(
+            response.data["photo_variants"]["small"]["jpeg"].endswith("_small.jpeg")
+        )
+
+
+@override_settings(
+    ANOMALY_EWMA_ALPHA=0.2, ANOMALY_THRESHOLD=3, ANOMALY_MIN_OBSERVATIONS=5
+)
+class AnomalyDetectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("anomaly", "anomaly@example.com", "x")
+        today = timezone.localdate()
+        for amount in ["20", "22", "19", "21", "20", "23", "18"]:
+            Expense.objects.create(
+                user=self.user,
+                category="food",
+                title="Lunch",
+                amount=amount,
+                date=today,
+            )
+        self.outlier = Expense.objects.create(
+            user=self.user, category="food", title="Party", amount="400", date=today
+        )
+
+    def test_expenses_are_scored_on_creation(self):
+        scores = list(
+            Expense.objects.order_by("id").values_list("anomaly_score", flat=True)
+        )
+        self.assertEqual(scores[:5], [None] * 5)
+        self.assertTrue(all(abs(score) < 3 for score in scores[5:7]))
+        self.assertGreater(scores[7], 3)
+        statistics = self.user.category_statistics.get(category="food")
+        self.assertEqual(statistics.count, 8)
+
+    def test_anomalies_endpoint_and_dashboard(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("expense-anomalies"))
+        self.assertEqual([row["id"] for row in response.data], [self.outlier.id])
+        response = client.get(reverse("dashboard"))
+        self.assertEqual(
+            [row["id"] for row in response.data["anomalies"]], [self.outlier.id]
+        )
+
+    def test_rebuild_matches_incremental_updates(self):
+        statistics = self.user.category_statistics.get()
+        scores = list(Expense.objects.values_list("id", "anomaly_score"))
+        Expense.objects.update(anomaly_score=None)
+
+        call_command("rebuild_category_statistics", stdout=io.StringIO())
+
+        rebuilt = self.user.category_statistics.get()
+        self.assertEqual(rebuilt.count, statistics.count)
+        self.assertAlmostEqual(rebuilt.mean, statistics.mean)
+        self.assertAlmostEqual(rebuilt.variance, statistics.variance)
+        self.assertEqual(
+            list(Expense.objects.values_list("id", "anomaly_score")), scores
+        )
+
+    def assert_matches_rebuild(self):
+        call_command("rebuild_category_statistics", stale=True, stdout=io.StringIO())
+        self.assertFalse(self.user.category_statistics.filter(stale=True).exists())
+        statistics = list(
+            self.user.category_statistics.order_by("category").values_list(
+                "category", "count", "mean", "variance"
+            )
+        )
+        scores = list(Expense.objects.values_list("id", "anomaly_score"))
+
+        call_command("rebuild_category_statistics", stdout=io.StringIO())
+
+        self.assertEqual(
+            list(
+                self.user.category_statistics.order_by("category").values_list(
+                    "category", "count", "mean", "variance"
+                )
+            ),
+            statistics,
+        )
+        self.assertEqual(
+            list(Expense.objects.values_list("id", "anomaly_score")), scores
+        )
+
+    def test_edits_rescore_the_expense_and_mark_categories_stale(self):
+        self.outlier.amount = "21"
+        # The category is not replayed while saving
+        with self.assertNumQueries(8):
+            self.outlier.save()
+        self.outlier.refresh_from_db()
+        self.assertLess(abs(self.outlier.anomaly_score), 3)
+        self.assertTrue(self.user.category_statistics.get(category="food").stale)
+        self.assert_matches_rebuild()
+
+        lunch = Expense.objects.filter(category="food").first()
+        lunch.category = "transportation"
+        lunch.save()
+        self.assertEqual(self.user.category_statistics.get(category="food").count, 8)
+        self.assert_matches_rebuild()
+        self.assertEqual(self.user.category_statistics.get(category="food").count, 7)
+
+        # Replays follow the order expenses were recorded, as creates do
+        Expense.objects.create(
+            user=self.user,
+            category="food",
+            title="Old receipt",
+            amount="90",
+            date=timezone.localdate() - timedelta(days=60),
+        )
+        self.assert_matches_rebuild()
+
+    def test_deletes_mark_their_category_stale(self):
+        with self.assertNumQueries(4):
+            self.outlier.delete()
+        Expense.objects.filter(amount="23").delete()
+        statistics = self.user.category_statistics.get()
+        self.assertEqual((statistics.count, statistics.stale), (8, True))
+        self.assert_matches_rebuild()
+        self.assertEqual(self.user.category_statistics.get().count, 6)
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        # Exchange rates are memoized per process
+        clear_exchange_rates()
+        exchange_rates()
+
+    def test_fit_follows_trend_and_season(self):
+        # Two years of 100 + 10/month with an extra 50 every December
+        values = [100 + 10 * t + (50 if t % 12 == 11 else 0) for t in range(36)]
+        predict = fit(month_index(date(2020, 1, 1)), values)
+        self.assertAlmostEqual(predict(month_index(date(2023, 1, 1))), 460, delta=10)
+        self.assertAlmostEqual(predict(month_index(date(2023, 12, 1))), 620, delta=10)
+
+    def test_goal_forecast(self):
+        user = User.objects.create_user("forecast", "forecast@example.com", "x")
+        today = date(2024, 6, 15)
+        for month in range(1, 7):
+            Expense.objects.bulk_create(
+                [
+                    Expense(
+                        user=user,
+                        category="food",
+                        title="Groceries",
+                        amount=300,
+                        date=date(2024, month, 1),
+                    )
+                ]
+            )
+        goal = Goal.objects.create(
+            user=user,
+            category="food",
+            target_amount=500,
+            start_date=date(2024, 6, 1),
+            end_date=date(2024, 6, 30),
+        )
+
+        with self.assertNumQueries(5):
+            forecast = forecast_goals(user, today)
+        (row,) = forecast["goals"]
+        self.assertEqual(row["id"], goal.id)
+        self.assertEqual(row["spent_amount"], 300)
+        self.assertEqual(row["projected_amount"], 450)
+        self.assertTrue(row["on_track"])
+        self.assertEqual(forecast["main_goals"], [])
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(reverse("goal-forecast"))
+        self.assertEqual(response.status_code, 200)
+
+
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("snapshot", "snapshot@example.com", "x")
+        create_sample_rows(self.user, 300)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_snapshot_with_todays_expenses_matches_live(self):
+        today = timezone.now().date()
+        call_command(
+            "precompute_dashboards",
+            workers=0,
+            as_of=today,
+            stdout=io.StringIO(),
+        )
+        Expense.objects.create(
+            user=self.user, category="food", title="Lunch", amount="12.30", date=today
+        )
+        self.assertTrue(DashboardSnapshot.objects.filter(user=self.user).exists())
+        from_snapshot = self.client.get(reverse("dashboard")).content
+
+        DashboardSnapshot.objects.all().delete()
+        live = self.client.get(reverse("dashboard")).content
+        self.assertEqual(from_snapshot, live)
+
+    def test_backdated_writes_drop_the_snapshot(self):
+        today = timezone.now().date()
+        store_snapshots([self.user.pk], today)
+        Expense.objects.create(
+            user=self.user,
+            category="food",
+            title="Dinner",
+            amount="20",
+            date=today - timedelta(days=40),
+        )
+        self.assertFalse(DashboardSnapshot.objects.filter(user=self.user).exists())
+
+
+class CurrencyTests(TestCase):
+    def setUp(self):
+        clear_exchange_rates()
+        self.addCleanup(clear_exchange_rates)
+        self.user = User.objects.create_user(
+            "currency", "currency@example.com", "x", base_currency="USD"
+        )
+
+    def load_rates(self, rows):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as file:
+            file.write("currency,rate,date\n" + rows)
+        self.addCleanup(os.remove, file.name)
+        call_command("load_exchange_rates", file.name, stdout=io.StringIO())
+
+    def test_totals_are_converted_in_the_query(self):
+        self.load_rates("USD,12000,2024-01-01\nUSD,12500,2024-02-01\nEUR,13750,\n")
+        for balance, currency in [("100", "USD"), ("110", "EUR"), ("250000", "UZS")]:
+            Account.objects.create(
+                user=self.user,
+                account_type="checking",
+                account_number="1",
+                balance=balance,
+                currency=currency,
+                organization_name="Bank",
+            )
+
+        total = Account.objects.filter(user=self.user).aggregate(
+            total=Sum(converted("balance", "USD"))
+        )["total"]
+        self.assertEqual(total, Decimal("241.00"))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("dashboard"))
+        self.assertEqual(response.data["total_balance"], Decimal("241.00"))
+        self.assertEqual(response.data["currency"], "USD")
+        self.assertEqual(response.data["unconverted_currencies"], [])
+
+    def test_currency_changes_drop_the_snapshot(self):
+        self.load_rates("USD,12000,2024-01-01\n")
+        today = timezone.now().date()
+        store_snapshots([self.user.pk], today)
+        self.load_rates("USD,11000,2023-12-01\n")
+        self.assertTrue(DashboardSnapshot.objects.filter(user=self.user).exists())
+        self.load_rates("USD,12500,2024-01-01\n")
+        self.assertFalse(DashboardSnapshot.objects.filter(user=self.user).exists())
+
+        store_snapshots([self.user.pk], today)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.put(reverse("profile"), {"base_currency": "UZS"})
+        self.assertFalse(DashboardSnapshot.objects.filter(user=self.user).exists())
+
+    def test_amounts_without_a_rate_are_reported(self):
+        self.assertEqual(convert(Decimal("5"), "EUR", "EUR"), Decimal("5"))
+        self.assertIsNone(convert(Decimal("5"), "EUR", "USD"))
+
+        for balance, currency in [("100", "USD"), ("250000", "UZS")]:
+            Account.objects.create(
+                user=self.user,
+                account_type="checking",
+                account_number="1",
+                balance=balance,
+                currency=currency,
+                organization_name="Bank",
+            )
+        Expense.objects.create(
+            user=self.user,
+            category="food",
+            title="Lunch",
+            amount="20",
+            currency="EUR",
+            date=timezone.localdate(),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("dashboard"))
+        self.assertEqual(response.data["total_balance"], Decimal("100.00"))
+        self.assertEqual(response.data["unconverted_currencies"], ["EUR", "UZS"])
+
+
+@override_settings(ARCHIVE_AFTER_DAYS=365)
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("archive", "archive@example.com", "x")
+        now = timezone.now()
+        Expense.objects.bulk_create(
+            Expense(
+                user=self.user,
+                category="food",
+                title=f"Expense {i}",
+                amount=i + 1,
+                date=timezone.localdate() - timedelta(days=20 * i),
+            )
+            for i in range(50)
+        )
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=self.user,
+                title=f"Transaction {i}",
+                amount=i + 1,
+                date=now - timedelta(days=20 * i),
+            )
+            for i in range(50)
+        )
+
+    def test_cold_rows_move_in_batches(self):
+        cutoff = timezone.localdate() - timedelta(days=365)
+        old_expenses = Expense.objects.filter(date__lt=cutoff).count()
+        self.assertGreater(old_expenses, 0)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        before = client.get(reverse("expense-list")).data
+
+        call_command("archive_records", batch_size=7, stdout=io.StringIO())
+
+        self.assertFalse(Expense.objects.filter(date__lt=cutoff).exists())
+        self.assertEqual(ArchivedExpense.objects.count(), old_expenses)
+        self.assertEqual(
+            ArchivedTransaction.objects.count() + Transaction.objects.count(),
+            50,
+        )
+        hot = client.get(reverse("expense-list")).data
+        self.assertEqual(len(hot), 50 - old_expenses)
+        everything = client.get(
+            reverse("expense-list"), {"include_archived": "true"}
+        ).data
+        self.assertEqual(everything, before)
+
+    def test_backdated_rows_are_merged_with_archived_ones(self):
+        call_command("archive_records", stdout=io.StringIO())
+        backdated = timezone.localdate() - timedelta(days=20 * 40 + 1)
+        Expense.objects.create(
+            user=self.user, category="food", title="Late", amount=1, date=backdated
+        )
+        Transaction.objects.create(
+            user=self.user,
+            title="Late",
+            amount=1,
+            date=timezone.now() - timedelta(days=20 * 48 + 1),
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # Between the 41st and 42nd expenses, and the 49th and 50th transactions
+        for name, position in (("expense-list", 41), ("transaction-list", 49)):
+            rows = client.get(reverse(name), {"include_archived": "true"}).data
+            self.assertEqual(len(rows), 51)
+            self.assertEqual([row["title"] for row in rows].index("Late"), position)
+
+    @override_settings(ARCHIVE_AFTER_DAYS=10)
+    # More requests than the burst rate allows
+    @mock.patch.object(SlidingWindowRateThrottle, "allow_request", return_value=True)
+    def test_analytics_read_archived_rows_when_asked(self, allow_request):
+        store_snapshots([self.user.pk], timezone.localdate())
+        client = APIClient()
+        client.force_authenticate(self.user)
+        names = [
+            "dashboard",
+            "monthly-expenses",
+            "category-expense",
+            "expense-anomalies",
+        ]
+        before = {name: client.get(reverse(name)).data for name in names}
+
+        call_command("archive_records", stdout=io.StringIO())
+
+        self.assertFalse(DashboardSnapshot.objects.filter(user=self.user).exists())
+        for name in names:
+            self.assertEqual(
+                client.get(reverse(name), {"include_archived": "true"}).data,
+                before[name],
+            )
+        self.assertNotEqual(
+            client.get(reverse("monthly-expenses")).data, before["monthly-expenses"]
+        )
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+        self.client.force_login(self.admin)
+        users = [
+            User.objects.create_user(f"owner{i}", f"owner{i}@example.com", "x")
+            for i in range(3)
+        ]
+        Transaction.objects.bulk_create(
+            Transaction(
+                user=users[i % 3],
+                title=f"Transaction {i}",
+                amount=i,
+                date=timezone.now() - timedelta(hours=i),
+            )
+            for i in range(60)
+        )
+        self.user = users[0]
+
+    def changelist(self, params=None):
+        return self.client.get(
+            reverse("admin:api_transaction_changelist"), params or {}
+        )
+
+    def test_changelist_queries_do_not_grow_with_rows_or_users(self):
+        self.changelist()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.changelist()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="admin-autocomplete"')
+        self.assertNotContains(response, "user__id__exact")
+        self.assertLess(len(queries), 10)
+
+    def test_user_filter_and_search(self):
+        response = self.changelist({"user": self.user.pk})
+        self.assertEqual(response.context["cl"].result_count, 20)
+        self.assertContains(response, f'<option value="{self.user.pk}" selected>')
+        response = self.changelist({"q": f"user:{self.user.username}"})
+        self.assertEqual(response.context["cl"].result_count, 20)
+        transaction = Transaction.objects.get(title="Transaction 12")
+        response = self.changelist({"q": f"id:{transaction.pk}"})
+        self.assertEqual(list(response.context["cl"].result_list), [transaction])
+        response = self.changelist({"q": '"Transaction 1"'})
+        self.assertEqual(response.context["cl"].result_count, 11)
+        # Plain terms only search title prefixes
+        response = self.changelist({"q": self.user.username})
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+    def test_account_numbers_are_searched_by_prefix(self):
+        Account.objects.create(
+            user=self.user,
+            account_type="checking",
+            account_number="12345",
+            balance=0,
+            organization_name="Bank",
+        )
+        response = self.client.get(
+            reverse("admin:api_account_changelist"), {"q": "123"}
+        )
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+class StaticSchemaTests(TestCase):
+    def test_serves_built_schema_with_etag(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "openapi.json")
+            with override_settings(API_SCHEMA_PATH=path):
+                self.assertEqual(self.client.get("/openapi.json").status_code, 404)
+                with override_settings(API_DOCS=True):
+                    call_command("build_api_schema", stdout=io.StringIO())
+
+                response = self.client.get("/openapi.json")
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("/dashboard/", response.json()["paths"])
+                self.assertIn("max-age=86400", response["Cache-Control"])
+                response = self.client.get(
+                    "/openapi.json", HTTP_IF_NONE_MATCH=response["ETag"]
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_docs_follow_debug(self):
+        # The URLconf only imports drf_yasg to serve /swagger/
+        for debug, loaded in [("False", False), ("True", True)]:
+            with self.subTest(debug=debug):
+                startup = measure_startup("backend.wsgi", env={"DEBUG": debug})
+                self.assertEqual("drf_yasg" in startup["modules"], loaded)
+
+
+class StartupTests(SimpleTestCase):
+    def test_cold_start_skips_heavy_modules(self):
+        # The time budget is checked by profile_startup, wall-clock time is
+        # too noisy for the test suite
+        startup = measure_startup("backend.wsgi", env={"API_DOCS": "False"})
+        for module in ("PIL", "drf_yasg"):
+            self.assertNotIn(module, startup["modules"])
+
+
+class MemoryBudgetTests(TestCase):
+    def test_requests_are_within_budget(self):
+        rows = 1000
+        user = User.objects.create_user(username="test")
+        create_sample_rows(user, rows)
+        for name in MEMORY_ENDPOINTS:
+            with self.subTest(name):
+                result = measure_memory(user, name)
+                self.assertEqual(result["status"], 200)
+                self.assertLess(
+                    result["peak"] / rows, settings.MEMORY_BYTES_PER_ROW_BUDGET
+                )
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="secret")
+        self.account = Account.objects.create(
+            user=self.user,
+            account_type="checking",
+            account_number="8600",
+            balance=100,
+            organization_name="Bank",
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}"
+        )
+
+    def batch(self, *requests):
+        return self.client.post(
+            reverse("batch"), {"requests": list(requests)}, format="json"
+        )
+
+    def test_returns_the_same_data_as_separate_requests(self):
+        paths = ["profile/", "accounts/", "bills/", "goals/main/", "expenses/category/"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(*({"path": path} for path in paths))
+        self.assertEqual(response.status_code, 200)
+        token_lookups = [
+            query for query in queries if "authtoken_token" in query["sql"]
+        ]
+        self.assertEqual(len(token_lookups), 1)
+
+        cache.clear()
+        for path, result in zip(paths, response.data["responses"]):
+            self.assertEqual(result["status"], 200)
+            self.assertEqual(
+                result["data"], self.client.get(f"/api/v1/{path}").data, path
+            )
+
+    def test_query_params_and_errors(self):
+        response = self.batch(
+            {"path": f"/api/v1/accounts/{self.account.pk}/"},
+            {"path": "accounts/0/"},
+            {"path": "expenses/?include_archived=true", "params": {"page": "1"}},
+            {"path": "missing/"},
+            {"path": "batch/"},
+            {"path": "/admin/"},
+        )
+        self.assertEqual(
+            [result["status"] for result in response.data["responses"]],
+            [200, 404, 200, 404, 404, 404],
+        )
+        self.assertEqual(
+            response.data["responses"][0]["data"]["account_number"], "8600"
+        )
+
+    def test_validates_requests(self):
+        self.assertEqual(self.batch().status_code, 400)
+        too_many = [{"path": "profile/"}] * (settings.BATCH_MAX_REQUESTS + 1)
+        self.assertEqual(self.batch(*too_many).status_code, 400)
+        self.client.credentials()
+        self.assertEqual(self.batch({"path": "profile/"}).status_code, 401)
+
+
+class DashboardEventsTests(TransactionTestCase):
+    def setUp(self):
+        # A broker of its own, without the subscriptions left by other tests
+        patcher = mock.patch.object(events, "broker", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username="test", password="secret")
+        self.token = Token.objects.create(user=self.user)
+        self.account = Account.objects.create(
+            user=self.user,
+            account_type="checking",
+            account_number="8600",
+            balance=100,
+            organization_name="Bank",
+        )
+
+    async def test_streams_deltas_to_subscribers(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        ticket = await sync_to_async(client.post)(reverse("dashboard-events-ticket"))
+        response = await self.async_client.get(
+            reverse("dashboard-events"), {"ticket": ticket.data["ticket"]}
+        )
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+
+        self.account.balance = 250
+        await sync_to_async(self.account.save)()
+        message = await anext(stream)
+        self.assertTrue(message.startswith(b"event: account\n"))
+        self.assertIn(b'"balance":250', message)
+
+        await sync_to_async(Transaction.objects.create)(
+            user=self.user, title="Coffee", amount=5, date=timezone.now()
+        )
+        self.assertIn(b'"title":"Coffee"', await anext(stream))
+
+        await sync_to_async(Expense.objects.create)(
+            user=self.user,
+            category="food",
+            title="Lunch",
+            amount=12,
+            date=timezone.now().date(),
+        )
+        message = await anext(stream)
+        self.assertTrue(message.startswith(b"event: categories\n"))
+        self.assertIn(b'"current_month_total":12', message)
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.01, EVENTS_STREAM_SECONDS=0.05)
+    async def test_heartbeats_until_the_stream_ends(self):
+        response = await self.async_client.get(
+            reverse("dashboard-events"),
+            headers={"Authorization": f"Token {self.token.key}"},
+        )
+        messages = [message async for message in response.streaming_content]
+        self.assertGreater(messages.count(b": heartbeat\n\n"), 1)
+        self.assertFalse(get_broker().has_subscribers(self.user.pk))
+
+    async def test_rejects_missing_and_bad_credentials(self):
+        with mock.patch("time.time", return_value=time.time() - 120):
+            expired = issue_ticket(self.user)
+        for params, headers in [
+            ({}, {}),
+            ({}, {"Authorization": "Token wrong"}),
+            ({"ticket": "wrong"}, {}),
+            ({"ticket": expired}, {}),
+            # API tokens are not accepted in the URL
+            ({"token": self.token.key}, {}),
+        ]:
+            response = await self.async_client.get(
+                reverse("dashboard-events"), params, headers=headers
+            )
+            self.assertEqual(response.status_code, 401)
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(reverse("dashboard-events")).status_code, 501)
+
+
+@override_settings(PURGE_WORKERS=0)
+class PurgeTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"user{i}", password="secret")
+            for i in range(2)
+        ]
+        for user in self.users:
+            Token.objects.create(user=user)
+            create_sample_rows(user, 30)
+            MainGoal.objects.create(
+                user=user,
+                target_amount=100,
+                start_date=date(2024, 1, 1),
+                end_date=date(2024, 12, 31),
+            )
+
+    def assertPurged(self, user):
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        for model in [Transaction, Expense, Bill, Account, Goal, MainGoal, Token]:
+            self.assertFalse(model.objects.filter(user=user.pk).exists(), model)
+        # The other user's data is untouched
+        self.assertEqual(self.users[1].transactions.count(), 30)
+        self.assertTrue(Token.objects.filter(user=self.users[1]).exists())
+
+    def test_purges_in_batches_and_resumes(self):
+        user = self.users[0]
+        request_purge(user)
+        with self.assertRaises(KeyboardInterrupt):
+            purge_user(user.pk, 7, mock.Mock(side_effect=KeyboardInterrupt))
+        self.assertTrue(User.objects.filter(pk=user.pk, is_active=False).exists())
+
+        output = io.StringIO()
+        call_command("purge_users", batch_size=7, stdout=output)
+        self.assertIn(f"Purged user {user.pk}", output.getvalue())
+        self.assertPurged(user)
+
+    def test_delete_account_endpoint(self):
+        user = self.users[0]
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.delete(reverse("profile"), {"password": "wrong"})
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(reverse("profile"), {"password": "secret"})
+        self.assertEqual(response.status_code, 202)
+        self.assertPurged(user)
+
+
+class BackupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="test", password="secret", first_name="Ann", base_currency="USD"
+        )
+        create_sample_rows(self.user, 40)
+
+    def snapshot(self, user):
+        return {
+            model._meta.label: sorted(
+                model.objects.filter(user=user).values_list(
+                    *(field.attname for field, _, _ in backup_columns(model))
+                ),
+                key=repr,
+            )
+            for model in BACKUP_MODELS
+        }
+
+    def test_backup_and_restore_round_trip(self):
+        archive = b"".join(backup_chunks(self.user, batch_size=7))
+        before = self.snapshot(self.user)
+
+        other = User.objects.create_user(username="other")
+        counts = restore_backup(other, io.BytesIO(archive))
+        self.assertEqual(counts["api.Transaction"], 40)
+        self.assertEqual(self.snapshot(other), before)
+        other.refresh_from_db()
+        self.assertEqual((other.first_name, other.base_currency), ("Ann", "USD"))
+
+        # Restoring again replaces the data instead of adding to it
+        restore_backup(other, io.BytesIO(archive))
+        self.assertEqual(self.snapshot(other), before)
+
+        # Anomaly scores and category statistics are recomputed
+        restored = list(
+            other.category_statistics.order_by("category").values_list(
+                "category", "count", "mean", "variance"
+            )
+        )
+        scores = list(
+            Expense.objects.filter(user=other).values_list("id", "anomaly_score")
+        )
+        call_command("rebuild_category_statistics", stdout=io.StringIO())
+        self.assertEqual(
+            list(
+                other.category_statistics.order_by("category").values_list(
+                    "category", "count", "mean", "variance"
+                )
+            ),
+            restored,
+        )
+        self.assertEqual(
+            list(Expense.objects.filter(user=other).values_list("id", "anomaly_score")),
+            scores,
+        )
+
+    def crafted(self, model, columns, rows, count=None):
+        manifest = json.dumps(
+            {
+                "profile": {},
+                "models": [
+                    [
+                        model._meta.label,
+                        [[field.name, kind, null] for field, kind, null in columns],
+                    ]
+                ],
+            }
+        ).encode()
+        frame = encode_frame(0, columns, rows)
+        if count is not None:
+            frame = frame[:2] + struct.pack("<I", count) + frame[6:]
+        return io.BytesIO(
+            gzip.compress(
+                MAGIC
+                + struct.pack("<BI", VERSION, len(manifest))
+                + manifest
+                + frame
+                + struct.pack("<H", END)
+            )
+        )
+
+    def test_invalid_rows_are_rejected(self):
+        columns = backup_columns(Account)
+        names = [field.name for field, _, _ in columns]
+        row = Account.objects.filter(user=self.user).values_list(
+            *(field.attname for field, _, _ in columns)
+        )[0]
+
+        def account(**changes):
+            return tuple(changes.get(name, value) for name, value in zip(names, row))
+
+        before = self.snapshot(self.user)
+        for archive in [
+            self.crafted(Account, columns, [account(balance=Decimal("-1"))]),
+            self.crafted(Account, columns, [account(account_type="vault")]),
+            self.crafted(Account, columns, [account(balance=Decimal("1e12"))]),
+            self.crafted(Account, columns, [account(organization_name="")]),
+            self.crafted(Account, columns, [account()], count=10**9),
+            # A Transaction without its date column is not null-safe
+            self.crafted(
+                Transaction,
+                [
+                    column
+                    for column in backup_columns(Transaction)
+                    if column[1] != "datetime"
+                ],
+                [("Coffee", None, Decimal("5"), "UZS")],
+            ),
+        ]:
+            with self.assertRaises(BackupError):
+                restore_backup(self.user, archive)
+        self.assertEqual(self.snapshot(self.user), before)
+
+    def test_endpoints(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse("backup"))
+        self.assertEqual(response.status_code, 200)
+        archive = b"".join(response.streaming_content)
+        before = self.snapshot(self.user)
+
+        Transaction.objects.filter(user=self.user).delete()
+        upload = SimpleUploadedFile("backup.ssbk", archive)
+        response = client.post(reverse("backup"), {"archive": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["restored"]["api.Expense"], 40)
+        self.assertEqual(self.snapshot(self.user), before)
+
+        for data in [archive[:-20], b"not a backup"]:
+            upload = SimpleUploadedFile("backup.ssbk", data)
+            response = client.post(reverse("backup"), {"archive": upload})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.snapshot(self.user), before)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, key, title="Lunch"):
+        return self.client.post(
+            reverse("transaction-list"),
+            {
+                "title": title,
+                "amount": "12.50",
+                "date": "2024-01-01T10:00:00Z",
+                "time": "2024-01-01T10:00:00Z",
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_response(self):
+        first = self.create("abc")
+        self.assertEqual(first.status_code, 201, first.data)
+        with self.assertNumQueries(1):
+            retry = self.create("abc")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        self.assertEqual(self.create("def").status_code, 201)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_key_reused_for_another_request(self):
+        self.create("abc")
+        self.assertEqual(self.create("abc", title="Dinner").status_code, 422)
+        self.assertEqual(self.create("x" * 256).status_code, 400)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_keys_are_per_user_and_expire(self):
+        self.create("abc")
+        other = User.objects.create_user(username="other")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.create("abc").status_code, 201)
+
+        IdempotencyRecord.objects.update(
+            created_at=timezone.now()
+            - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL + 1)
+        )
+        self.assertNotIn("Idempotent-Replayed", self.create("abc"))
+        self.assertEqual(Transaction.objects.count(), 3)
+        call_command("expire_idempotency_keys", stdout=io.StringIO())
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every GET endpoint runs the same queries whatever the amount of data.
+    """
+
+    SIZES = [2, 8, 32]
+
+    def seed(self, rows):
+        user = User.objects.create_user(username=f"user{rows}", is_staff=True)
+        Token.objects.create(user=user)
+        create_sample_rows(user, rows)
+        return user
+
+    def routes(self):
+        for pattern in urls.urlpatterns:
+            view = getattr(pattern.callback, "view_class", None)
+            # Only detail routes have arguments the harness can fill in
+            if set(pattern.pattern.converters) - {"pk"}:
+                continue
+            if view is not None and issubclass(view, APIView) and hasattr(view, "get"):
+                yield pattern, view
+
+    def request(self, pattern, view, user):
+        kwargs = {}
+        if "pk" in pattern.pattern.converters:
+            # Detail views are named after their model
+            model = apps.get_model("api", view.__name__.removesuffix("DetailAPIView"))
+            kwargs["pk"] = model.objects.filter(user=user).first().pk
+        cache.clear()
+        client = APIClient()
+        client.force_authenticate(user)
+        with QueryRecorder() as recorder:
+            response = client.get(reverse(pattern.name, kwargs=kwargs))
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 300, pattern.name)
+        return recorder
+
+    def test_query_count_is_constant_in_data_size(self):
+        users = [self.seed(rows) for rows in self.SIZES]
+        for pattern, view in self.routes():
+            with self.subTest(pattern.name):
+                smallest, *recorders = [
+                    self.request(pattern, view, user) for user in users
+                ]
+                baseline = smallest.counts()
+                for rows, recorder in zip(self.SIZES[1:], recorders):
+                    if len(recorder.queries) <= len(smallest.queries):
+                        continue
+                    grown = [
+                        query
+                        for query in recorder.repeated(1)
+                        if query[0] > baseline[fingerprint(query[1])]
+                    ]
+                    self.fail(
+                        f"{pattern.name} runs more queries with {rows} rows than "
+                        f"with {self.SIZES[0]}:\n"
+                        + "\n".join(format_query(*query) for query in grown)
+                    )
+
+    def test_recorder_reports_repeated_queries(self):
+        user = self.seed(3)
+        with QueryRecorder() as recorder:
+            for expense in Expense.objects.filter(user=user):
+                expense.user.username
+        ((count, sql, stack),) = recorder.repeated(2)
+        self.assertEqual(count, 3)
+        self.assertIn('FROM "api_user"', sql)
+        self.assertEqual(stack[-1].filename, __file__)
+
+    @override_settings(QUERY_INSPECTION_THRESHOLD=2)
+    def test_middleware_logs_repeated_queries(self):
+        user = self.seed(3)
+        request = RequestFactory().get("/")
+
+        def view(request):
+            for expense in Expense.objects.filter(user=user):
+                expense.user.username
+            return HttpResponse()
+
+        with self.assertLogs("api.middleware", "WARNING") as logs:
+            QueryInspectionMiddleware(view)(request)
+        self.assertIn("3 x SELECT", logs.output[0])
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        override = override_settings(
+            PROFILE_DIR=self.directory.name,
+            PROFILE_KEEP=2,
+            MIDDLEWARE=["api.middleware.ProfilingMiddleware", *settings.MIDDLEWARE],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create_user(username="staff", is_staff=True)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.staff).key}"
+        )
+
+    def test_staff_request_is_profiled(self):
+        response = self.client.get(reverse("dashboard"), HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+
+        profile = self.client.get(response["X-Profile"])
+        self.assertEqual(profile.status_code, 200)
+        path = os.path.join(self.directory.name, "profile.prof")
+        with open(path, "wb") as file:
+            file.write(b"".join(profile.streaming_content))
+        self.assertTrue(pstats.Stats(path).total_calls)
+
+        report = json.loads(
+            b"".join(self.client.get(response["X-Profile-SQL"]).streaming_content)
+        )
+        self.assertEqual(report["path"], reverse("dashboard"))
+        selects = [query for query in report["queries"] if "explain" in query]
+        self.assertTrue(selects)
+        self.assertTrue(all(query["explain"] for query in selects))
+
+    def test_other_requests_are_not_profiled(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertNotIn("X-Profile", response)
+
+        user = User.objects.create_user(username="test")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}"
+        )
+        response = self.client.get(reverse("dashboard"), {"profile": "1"})
+        self.assertNotIn("X-Profile", response)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_old_artifacts_are_pruned(self):
+        for _ in range(3):
+            self.client.get(reverse("profile"), HTTP_X_PROFILE="1")
+        self.assertEqual(len(os.listdir(self.directory.name)), 4)
+
+    def test_artifact_names_are_checked(self):
+        url = reverse("profile-artifact", kwargs={"name": "..%2Fsettings.py"})
+        self.assertEqual(self.client.get(url).status_code, 404)
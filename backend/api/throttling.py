@@ -0,0 +1,71 @@
+from rest_framework import throttling
+
+
+class SlidingWindowRateThrottle(throttling.SimpleRateThrottle):
+    """
+    SimpleRateThrottle that keeps two counters per client instead of the
+    timestamp of every request in the window.
+
+    Requests are counted per fixed window, and the previous window's count
+    is weighted by how much of it still overlaps the sliding window. Each
+    request costs one ``get_many`` and one ``incr`` whatever the rate, and
+    the atomic ``incr`` keeps counts correct when the cache is shared by
+    several processes.
+    """
+
+    def allow_request(self, request, view):
+        # Sub-requests of a batch were throttled as the batch request
+        if self.rate is None or getattr(request, "batched", False):
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        self.elapsed = offset / self.duration
+        current_key = f"{self.key}_{int(window)}"
+        previous_key = f"{self.key}_{int(window) - 1}"
+
+        counts = self.cache.get_many([current_key, previous_key])
+        self.current = counts.get(current_key, 0)
+        self.previous = counts.get(previous_key, 0)
+        if self.estimate() >= self.num_requests:
+            return self.throttle_failure()
+
+        # Counters outlive their window so they can weigh the next one
+        if not self.cache.add(current_key, 1, self.duration * 2):
+            try:
+                self.cache.incr(current_key)
+            except ValueError:
+                # Expired between add() and incr()
+                self.cache.set(current_key, 1, self.duration * 2)
+        return True
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed) + self.current
+
+    def wait(self):
+        remaining = self.duration * (1 - self.elapsed)
+        if self.current >= self.num_requests or not self.previous:
+            return remaining
+        # Time until the previous window's weight has dropped enough
+        excess = self.estimate() - self.num_requests + 1
+        return min(excess * self.duration / self.previous, remaining)
+
+
+class AnonRateThrottle(SlidingWindowRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class UserRateThrottle(SlidingWindowRateThrottle, throttling.UserRateThrottle):
+    pass
+
+
+class BurstRateThrottle(UserRateThrottle):
+    """
+    Short-term limit on top of the daily user and anonymous rates.
+    """
+
+    scope = "burst"
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+from django.db.models import DateField
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek
+
+GRANULARITIES = {
+    "day": TruncDay,
+    "week": TruncWeek,
+    "month": TruncMonth,
+    "quarter": TruncQuarter,
+}
+
+
+def bucket_start(day, granularity):
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "quarter":
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def next_bucket(bucket, granularity):
+    if granularity == "day":
+        return bucket + timedelta(days=1)
+    if granularity == "week":
+        return bucket + timedelta(weeks=1)
+    step = 1 if granularity == "month" else 3
+    month = bucket.month - 1 + step
+    return bucket.replace(year=bucket.year + month // 12, month=month % 12 + 1)
+
+
+def buckets(start, end, granularity):
+    """
+    All bucket start dates covering ``start`` to ``end`` (inclusive).
+    """
+    result = []
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        result.append(bucket)
+        bucket = next_bucket(bucket, granularity)
+    return result
+
+
+def time_series(queryset, date_field, measures, years, granularity="month"):
+    """
+    Aggregate ``queryset`` into dense series over the given years.
+
+    ``measures`` maps series names to aggregates, e.g. ``{"total":
+    Sum("amount")}``. All series are computed in one grouped query and every
+    bucket of the range is present, with 0 for buckets without rows:
+
+        {"total": {date(2024, 1, 1): Decimal("12.50"), date(2024, 2, 1): 0}}
+    """
+    grouped = grouped_time_series(
+        queryset, None, date_field, measures, years, granularity
+    )
+    return grouped.get(None) or empty_series(measures, years, granularity)
+
+
+def grouped_time_series(
+    queryset, group_field, date_field, measures, years, granularity="month"
+):
+    """
+    Like ``time_series`` for every value of ``group_field`` at once, e.g.
+    ``"user_id"`` to aggregate many users in one query. Returns ``{group:
+    series}`` for the groups that have rows; ``group_field=None`` puts all
+    rows in a single group.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    first_year, last_year = min(years), max(years)
+    truncate = GRANULARITIES[granularity](date_field, output_field=DateField())
+    groups = [group_field] if group_field else []
+
+    rows = (
+        queryset.filter(
+            **{
+                f"{date_field}__year__gte": first_year,
+                f"{date_field}__year__lte": last_year,
+            }
+        )
+        .order_by()
+        .values(*groups, bucket=truncate)
+        .annotate(**measures)
+    )
+
+    grouped = {}
+    for row in rows:
+        group = row[group_field] if group_field else None
+        if group not in grouped:
+            grouped[group] = empty_series(measures, years, granularity)
+        series = grouped[group]
+        for name in measures:
+            if row[name] is not None:
+                series[name][row["bucket"]] = row[name]
+    return grouped
+
+
+def add_series(series, other):
+    """
+    Add the buckets of ``other`` into ``series``, both over the same range,
+    e.g. to total a query of the main and the archive table.
+    """
+    for name, values in other.items():
+        for bucket, value in values.items():
+            series[name][bucket] += value
+    return series
+
+
+def empty_series(measures, years, granularity="month"):
+    all_buckets = buckets(date(min(years), 1, 1), date(max(years), 12, 31), granularity)
+    return {name: dict.fromkeys(all_buckets, 0) for name in measures}
+
+
+def by_year_and_month(series, years):
+    """
+    Reshape a monthly series into ``{year: {"January": value, ...}}``, the
+    format of the monthly chart endpoints.
+    """
+    result = {year: {} for year in years}
+    for bucket, value in series.items():
+        if bucket.year in result:
+            result[bucket.year][bucket.strftime("%B")] = value
+    return result
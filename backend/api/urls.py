@@ -3,7 +3,6 @@ from .views import (
     RegisterView,
     LoginView,
     LogoutView,
-    TestView,
     PasswordChangeView,
     PasswordResetView,
     TransactionListCreateAPIView,
@@ -16,13 +15,22 @@ from .views import (
     ExpenseDetailAPIView,
     ExpenseByMonthAPIView,
     ExpenseByCategoryAPIView,
+    ExpenseAnomalyAPIView,
     GoalListCreateAPIView,
     GoalDetailAPIView,
     MainGoalAPIView,
     GoalByMonthAPIView,
     GoalByCategoryAPIView,
+    GoalForecastAPIView,
     DashboardAPIView,
+    DashboardEventsTicketView,
+    DashboardEventsView,
+    BatchAPIView,
+    BackupView,
     ProfileView,
+    DatabasePoolView,
+    ProfileArtifactView,
+    UserTokenListView,
 )
 
 urlpatterns = [
@@ -30,7 +38,6 @@ urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path("login/", LoginView.as_view(), name="login"),
     path("logout/", LogoutView.as_view(), name="logout"),
-    path("test-view/", TestView.as_view(), name="test-view"),
     # Password Reset URLs
     path("password_change/", PasswordChangeView.as_view(), name="password-change"),
     path("password_reset/", PasswordResetView.as_view(), name="password-reset"),
@@ -58,13 +65,35 @@ urlpatterns = [
         ExpenseByCategoryAPIView.as_view(),
         name="category-expense",
     ),
+    path(
+        "expenses/anomalies/",
+        ExpenseAnomalyAPIView.as_view(),
+        name="expense-anomalies",
+    ),
     # Goal URLs
     path("goals/", GoalListCreateAPIView.as_view(), name="goal-list"),
     path("goals/<int:pk>/", GoalDetailAPIView.as_view(), name="goal-detail"),
     path("goals/main/", MainGoalAPIView.as_view(), name="main-goal"),
     path("goals/monthly/", GoalByMonthAPIView.as_view(), name="monthly-goals"),
     path("goals/category/", GoalByCategoryAPIView.as_view(), name="category-goals"),
+    path("goals/forecast/", GoalForecastAPIView.as_view(), name="goal-forecast"),
     # URL
     path("dashboard/", DashboardAPIView.as_view(), name="dashboard"),
+    path("dashboard/events/", DashboardEventsView.as_view(), name="dashboard-events"),
+    path(
+        "dashboard/events/ticket/",
+        DashboardEventsTicketView.as_view(),
+        name="dashboard-events-ticket",
+    ),
     path("profile/", ProfileView.as_view(), name="profile"),
+    path("batch/", BatchAPIView.as_view(), name="batch"),
+    path("backup/", BackupView.as_view(), name="backup"),
+    # Diagnostics URLs
+    path("diagnostics/db-pool/", DatabasePoolView.as_view(), name="db-pool"),
+    path("diagnostics/users/", UserTokenListView.as_view(), name="user-tokens"),
+    path(
+        "diagnostics/profiles/<str:name>",
+        ProfileArtifactView.as_view(),
+        name="profile-artifact",
+    ),
 ]
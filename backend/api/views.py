@@ -1,23 +1,43 @@
-from datetime import datetime
+import os
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Sum
-from django.db.models.functions import TruncMonth
-from django.http import Http404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from drf_yasg.utils import swagger_auto_schema
+from django.views import View
 from rest_framework import status
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .anomalies import anomalous
+from .archive import include_archived, newest_first, user_querysets
+from .backup import BackupError, backup_chunks, restore_backup
+from .batch import dispatch_batched
+from .currency import converted, unconverted_currencies
+from .dashboards import CATEGORIES, category_totals, dashboard_charts, month_starts
+from .docs import swagger_auto_schema
+from .events import event_stream, get_broker, issue_ticket, ticket_user, token_user
+from .forecasting import forecast_goals
+from .idempotency import idempotent
 from .models import Account, Bill, Expense, Goal, MainGoal, Transaction, User
 from .serializers import (
+    AccountDeleteSerializer,
     AccountSerializer,
+    AccountValuesSerializer,
+    BatchSerializer,
     BillSerializer,
+    BillValuesSerializer,
+    ExpenseAnomalyValuesSerializer,
     ExpenseSerializer,
+    ExpenseValuesSerializer,
     GoalSerializer,
+    GoalValuesSerializer,
     LoginSerializer,
     MainGoalSerializer,
     PasswordChangeSerializer,
@@ -25,7 +45,14 @@ from .serializers import (
     ProfileSerializer,
     RegisterSerializer,
     TransactionSerializer,
+    TransactionValuesSerializer,
 )
+from .pagination import PageSizePagination
+from .pool import pool_stats
+from .profiling import ARTIFACT_NAME
+from .purge import schedule_purge
+from .routers import pin_credentials
+from .timeseries import add_series, by_year_and_month, time_series
 
 
 class RegisterView(APIView):
@@ -37,6 +64,8 @@ class RegisterView(APIView):
         if serializer.is_valid():
             user = serializer.save()
             token, created = Token.objects.get_or_create(user=user)
+            # The client reads with this token next
+            pin_credentials(f"Token {token.key}")
             return Response(
                 {"user": RegisterSerializer(user).data, "token": token.key},
                 status=status.HTTP_201_CREATED,
@@ -53,6 +82,8 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data["user"]
             token, created = Token.objects.get_or_create(user=user)
+            # The client reads with this token next
+            pin_credentials(f"Token {token.key}")
             return Response(
                 {
                     "user": {"username": user.username, "email": user.email},
@@ -67,6 +98,7 @@ class LoginView(APIView):
 class LogoutView(APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    read_from_replica = False  # Writes on GET
 
     def get(self, request):
         # Check if the user actually has a token
@@ -103,7 +135,7 @@ class PasswordChangeView(APIView):
     @swagger_auto_schema(request_body=PasswordChangeSerializer)
     def post(self, request):
         serializer = PasswordChangeSerializer(
-            data=request.data, context={"request": request}
+            request.user, data=request.data, context={"request": request}
         )
         if serializer.is_valid():
             serializer.save()
@@ -131,22 +163,54 @@ class ProfileView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(request_body=AccountDeleteSerializer)
+    def delete(self, request):
+        serializer = AccountDeleteSerializer(request.user, data=request.data)
+        if serializer.is_valid():
+            # The account is closed now, its data is deleted in the background
+            schedule_purge(request.user)
+            return Response(
+                {"message": "Account scheduled for deletion."},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
-class TestView(APIView):
+class UserTokenListView(APIView):
     authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAdminUser]
+    read_from_replica = False  # Creates missing tokens
 
     def get(self, request):
-        users = User.objects.all()
-        user_data = []
-        for user in users:
-            token = Token.objects.get_or_create(user=user)[0]
-            user_data.append({"user": LoginSerializer(user).data, "token": token.key})
-        return Response(
-            {
-                "message": "This is a secure test view",
-                "users_with_tokens": user_data,
-            }
+        paginator = PageSizePagination()
+        users = paginator.paginate_queryset(
+            User.objects.select_related("auth_token").order_by("id"), request, self
+        )
+
+        # Create the tokens of users that have none in a single statement
+        missing = [user for user in users if not hasattr(user, "auth_token")]
+        if missing:
+            Token.objects.bulk_create(
+                [Token(user=user, key=Token.generate_key()) for user in missing],
+                ignore_conflicts=True,
+            )
+            # Read them back in case a concurrent request created some first
+            tokens = Token.objects.filter(user__in=missing).in_bulk(
+                field_name="user_id"
+            )
+            for user in missing:
+                user.auth_token = tokens[user.id]
+
+        return paginator.get_paginated_response(
+            [
+                {
+                    "id": user.id,
+                    "username": user.username,
+                    "email": user.email,
+                    "token": user.auth_token.key,
+                }
+                for user in users
+            ]
         )
 
 
@@ -155,10 +219,14 @@ class TransactionListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = TransactionSerializer(request.user.transactions.all(), many=True)
-        return Response(serializer.data)
+        transactions = newest_first(
+            TransactionValuesSerializer,
+            user_querysets(request.user, "transactions", include_archived(request)),
+        )
+        return Response(transactions)
 
     @swagger_auto_schema(request_body=TransactionSerializer)
+    @idempotent
     def post(self, request):
         serializer = TransactionSerializer(
             data=request.data, context={"request": request}
@@ -206,10 +274,10 @@ class BillListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = BillSerializer(request.user.bills.all(), many=True)
-        return Response(serializer.data)
+        return Response(BillValuesSerializer.serialize(request.user.bills.all()))
 
     @swagger_auto_schema(request_body=BillSerializer)
+    @idempotent
     def post(self, request):
         serializer = BillSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
@@ -255,10 +323,10 @@ class AccountListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = AccountSerializer(request.user.accounts.all(), many=True)
-        return Response(serializer.data)
+        return Response(AccountValuesSerializer.serialize(request.user.accounts.all()))
 
     @swagger_auto_schema(request_body=AccountSerializer)
+    @idempotent
     def post(self, request):
         serializer = AccountSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
@@ -304,10 +372,14 @@ class ExpenseListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = ExpenseSerializer(request.user.expenses.all(), many=True)
-        return Response(serializer.data)
+        expenses = newest_first(
+            ExpenseValuesSerializer,
+            user_querysets(request.user, "expenses", include_archived(request)),
+        )
+        return Response(expenses)
 
     @swagger_auto_schema(request_body=ExpenseSerializer)
+    @idempotent
     def post(self, request):
         serializer = ExpenseSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
@@ -353,10 +425,10 @@ class GoalListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = GoalSerializer(request.user.goals.all(), many=True)
-        return Response(serializer.data)
+        return Response(GoalValuesSerializer.serialize(request.user.goals.all()))
 
     @swagger_auto_schema(request_body=GoalSerializer)
+    @idempotent
     def post(self, request):
         serializer = GoalSerializer(data=request.data, context={"request": request})
         if serializer.is_valid():
@@ -402,46 +474,36 @@ class ExpenseByMonthAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        current_year = datetime.now().year
-        last_year = current_year - 1
-        months = [
-            "January",
-            "February",
-            "March",
-            "April",
-            "May",
-            "June",
-            "July",
-            "August",
-            "September",
-            "October",
-            "November",
-            "December",
-        ]
+        current_year = timezone.now().year
+        years = [current_year - 1, current_year]
 
-        # Initialize data dictionaries for both years and all months
-        monthly_expenses_data = {
-            year: {month: 0 for month in months} for year in [last_year, current_year]
-        }
+        # Aggregate expenses per month, with every month of both years present
+        measures = {"total": Sum(converted("amount", request.user.base_currency))}
+        querysets = user_querysets(request.user, "expenses", include_archived(request))
+        series = time_series(querysets[0], "date", measures, years)
+        for queryset in querysets[1:]:
+            add_series(series, time_series(queryset, "date", measures, years))
+        monthly_expenses_data = by_year_and_month(series["total"], years)
 
-        # Fetch and aggregate expenses
-        expenses = (
-            Expense.objects.filter(
-                user=request.user, date__year__in=[last_year, current_year]
-            )
-            .annotate(month=TruncMonth("date"))
-            .values("month", "date__year")
-            .annotate(total=Sum("amount"))
-            .order_by("date__year", "month")
-        )
+        return Response(monthly_expenses_data)
 
-        # Populate the expenses data
-        for expense in expenses:
-            year = expense["date__year"]
-            month_name = expense["month"].strftime("%B")
-            monthly_expenses_data[year][month_name] = expense["total"]
 
-        return Response(monthly_expenses_data)
+class ExpenseAnomalyAPIView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Expenses far above the usual spending of their category
+        expenses = newest_first(
+            ExpenseAnomalyValuesSerializer,
+            [
+                anomalous(queryset)
+                for queryset in user_querysets(
+                    request.user, "expenses", include_archived(request)
+                )
+            ],
+        )
+        return Response(expenses)
 
 
 class ExpenseByCategoryAPIView(APIView):
@@ -449,81 +511,40 @@ class ExpenseByCategoryAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        current_date = timezone.now()
-        current_month = current_date.month
-        current_year = current_date.year
-        last_month = current_month - 1 if current_month > 1 else 12
-        last_year = current_year if current_month > 1 else current_year - 1
-        CATEGORIES = [
-            "housing",
-            "food",
-            "transportation",
-            "entertainment",
-            "education",
-            "health",
-            "shopping",
-        ]
-
-        # Initialize category data for detailed current month expenses
+        today = timezone.now().date()
+        archived = include_archived(request)
+        # Totals and percentage changes by category in one aggregate query
+        categorized_expenses = category_totals(
+            request.user.id, today, include_archived=archived
+        )
         current_month_detailed = {
-            category: {"total": 0, "expenses": []} for category in CATEGORIES
+            entry["category"]: {"total": entry["current_month_total"], "expenses": []}
+            for entry in categorized_expenses
         }
 
-        # Fetch detailed current month expenses
-        current_month_expenses = Expense.objects.filter(
-            user=request.user, date__year=current_year, date__month=current_month
+        # Current month expenses read as values, not serialized row by row
+        _, current_start, next_start = month_starts(today)
+        current_month_expenses = newest_first(
+            ExpenseValuesSerializer,
+            [
+                queryset.filter(
+                    category__in=CATEGORIES,
+                    date__gte=current_start,
+                    date__lt=next_start,
+                )
+                for queryset in user_querysets(request.user, "expenses", archived)
+            ],
         )
-
-        # Fill category data with actual expenses
         for expense in current_month_expenses:
-            serialized_expense = ExpenseSerializer(expense).data
-            current_month_detailed[expense.category]["total"] += expense.amount
-            current_month_detailed[expense.category]["expenses"].append(
-                serialized_expense
-            )
+            current_month_detailed[expense["category"]]["expenses"].append(expense)
 
-        # Aggregate last month expenses by category for comparison
-        last_month_expenses = (
-            Expense.objects.filter(
-                user=request.user, date__year=last_year, date__month=last_month
-            )
-            .values("category")
-            .annotate(total=Sum("amount"))
+        return Response(
+            {
+                "categorized_expenses": categorized_expenses,
+                "current_month_expenses": current_month_detailed,
+            }
         )
 
-        # Initialize last month totals for comparison
-        last_expenses_dict = {category: 0 for category in CATEGORIES}
-        for expense in last_month_expenses:
-            last_expenses_dict[expense["category"]] = expense["total"]
-
-        # Calculate percentage change by category
-        categorized_expenses = []
-        for category in CATEGORIES:
-            current_total = current_month_detailed[category]["total"]
-            last_total = last_expenses_dict[category]
-            percentage_change = (
-                ((current_total - last_total) / last_total) * 100
-                if last_total > 0
-                else (100 if current_total > 0 else 0)
-            )
-
-            categorized_expenses.append(
-                {
-                    "category": category,
-                    "current_month_total": current_total,
-                    "last_month_total": last_total,
-                    "percentage_change": round(percentage_change, 2),
-                }
-            )
-
-        # Construct the response
-        response = {
-            "categorized_expenses": categorized_expenses,
-            "current_month_expenses": current_month_detailed,
-        }
-
-        return Response(response)
-
 
 class MainGoalAPIView(APIView):
     authentication_classes = [TokenAuthentication]
@@ -572,45 +593,33 @@ class GoalByMonthAPIView(APIView):
 
     def get(self, request):
         current_year = timezone.now().year
-        last_year = current_year - 1
-        months = [
-            "January",
-            "February",
-            "March",
-            "April",
-            "May",
-            "June",
-            "July",
-            "August",
-            "September",
-            "October",
-            "November",
-            "December",
-        ]
+        years = [current_year - 1, current_year]
+
+        # Aggregate achieved amounts per month, with every month of both years present
+        series = time_series(
+            Goal.objects.filter(user=request.user),
+            "start_date",
+            {"total_achieved": Sum("achieved_amount")},
+            years,
+        )
+        monthly_goals_data = by_year_and_month(series["total_achieved"], years)
 
-        # Initialize data dictionaries for both years and all months
-        monthly_goals_data = {
-            year: {month: 0 for month in months} for year in [last_year, current_year]
-        }
+        return Response(monthly_goals_data)
 
-        # Fetch and aggregate goals
-        goals = (
-            Goal.objects.filter(
-                user=request.user, start_date__year__in=[last_year, current_year]
-            )
-            .annotate(month=TruncMonth("start_date"))
-            .values("month", "start_date__year")
-            .annotate(total_achieved=Sum("achieved_amount"))
-            .order_by("start_date__year", "month")
-        )
 
-        # Populate the goals data
-        for goal in goals:
-            year = goal["start_date__year"]
-            month_name = goal["month"].strftime("%B")
-            monthly_goals_data[year][month_name] = goal["total_achieved"]
+class GoalForecastAPIView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        return Response(monthly_goals_data)
+    def get(self, request):
+        today = timezone.localdate()
+        archived = include_archived(request)
+        key = f"goal-forecast:{request.user.pk}:{today.isoformat()}:{archived:d}"
+        forecast = cache.get(key)
+        if forecast is None:
+            forecast = forecast_goals(request.user, today, archived)
+            cache.set(key, forecast, settings.FORECAST_CACHE_SECONDS)
+        return Response(forecast)
 
 
 class GoalByCategoryAPIView(APIView):
@@ -680,157 +689,184 @@ class DashboardAPIView(APIView):
     def get(self, request):
         # Fetch user
         user = request.user
+        archived = include_archived(request)
         # Required vars
         current_date = timezone.now()
         current_month = current_date.month
         current_year = current_date.year
-        last_month = current_month - 1 if current_month > 1 else 12
-        last_year = current_year if current_month > 1 else current_year - 1
-        previous_year = current_year - 1
-        CATEGORIES = [
-            "housing",
-            "food",
-            "transportation",
-            "entertainment",
-            "education",
-            "health",
-            "shopping",
-        ]
-        months = [
-            "January",
-            "February",
-            "March",
-            "April",
-            "May",
-            "June",
-            "July",
-            "August",
-            "September",
-            "October",
-            "November",
-            "December",
-        ]
 
-        # Total balance and accounts data
-        total_balance = Account.objects.filter(user=user).aggregate(Sum("balance"))
-        accounts = Account.objects.filter(user=user)
-        accounts_serializer = AccountSerializer(accounts, many=True)
+        # Total balance, converted into the user's currency, and accounts data
+        total_balance = Account.objects.filter(user=user).aggregate(
+            balance__sum=Sum(converted("balance", user.base_currency))
+        )
+        accounts = AccountValuesSerializer.serialize(Account.objects.filter(user=user))
 
         # Recent transactions data
-        recent_transactions = Transaction.objects.filter(user=user).order_by("-date")[
-            :5
-        ]
-        transactions_serializer = TransactionSerializer(recent_transactions, many=True)
+        transactions = newest_first(
+            TransactionValuesSerializer,
+            user_querysets(user, "transactions", archived),
+            limit=5,
+        )
 
         # Main goal data
         main_goal = MainGoal.objects.filter(user=user).first()
         main_goal_serializer = MainGoalSerializer(main_goal)
 
-        # Expenses data for chart
-        # Initialize data dictionaries for both years and all months
-        monthly_expenses_data = {
-            year: {month: 0 for month in months}
-            for year in [previous_year, current_year]
-        }
-        # Fetch and aggregate expenses
-        expenses = (
-            Expense.objects.filter(
-                user=user, date__year__in=[previous_year, current_year]
-            )
-            .annotate(month=TruncMonth("date"))
-            .values("month", "date__year")
-            .annotate(total=Sum("amount"))
-            .order_by("date__year", "month")
+        # Expenses and goals data for charts, and categorized expenses
+        charts = dashboard_charts(user, current_date.date(), archived)
+
+        # Unusually large expenses this month
+        anomalies = newest_first(
+            ExpenseAnomalyValuesSerializer,
+            [
+                anomalous(
+                    queryset.filter(date__year=current_year, date__month=current_month)
+                )
+                for queryset in user_querysets(user, "expenses", archived)
+            ],
         )
 
-        # Populate the expenses data
-        for expense in expenses:
-            year = expense["date__year"]
-            month_name = expense["month"].strftime("%B")
-            monthly_expenses_data[year][month_name] = expense["total"]
-
-        # Goals data for chart
-        # Initialize data dictionaries for both years and all months
-        monthly_goals_data = {
-            year: {month: 0 for month in months}
-            for year in [previous_year, current_year]
+        # Response
+        response_data = {
+            "user": user.username,
+            "date": current_date.strftime("%d-%m-%Y"),
+            "total_balance": total_balance["balance__sum"],
+            "currency": user.base_currency,
+            # Amounts in these currencies have no rate and are left out of
+            # total_balance and the charts
+            "unconverted_currencies": unconverted_currencies(
+                [Account.objects.filter(user=user)]
+                + user_querysets(user, "expenses", archived),
+                user.base_currency,
+            ),
+            "accounts": accounts,
+            "main_goal": main_goal_serializer.data,
+            "recent_transactions": transactions,
+            "monthly_goals": charts["monthly_goals"],
+            "monthly_expenses": charts["monthly_expenses"],
+            "categorized_expenses": charts["categorized_expenses"],
+            "anomalies": anomalies,
         }
-        # Fetch and aggregate goals
-        goals = (
-            Goal.objects.filter(
-                user=user, start_date__year__in=[previous_year, current_year]
-            )
-            .annotate(month=TruncMonth("start_date"))
-            .values("month", "start_date__year")
-            .annotate(total_achieved=Sum("achieved_amount"))
-            .order_by("start_date__year", "month")
+
+        return Response(response_data)
+
+
+class BackupView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    batchable = False
+
+    def get(self, request):
+        # Streamed one batch of rows at a time, see api.backup
+        response = StreamingHttpResponse(
+            backup_chunks(request.user), content_type="application/octet-stream"
         )
+        filename = f"{request.user.username}-{timezone.localdate()}.ssbk"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
-        # Populate the goals data
-        for goal in goals:
-            year = goal["start_date__year"]
-            month_name = goal["month"].strftime("%B")
-            monthly_goals_data[year][month_name] = goal["total_achieved"]
-
-        # Categorized expenses data
-        # Fetch current month expenses by category
-        current_month_expenses = (
-            Expense.objects.filter(
-                user=request.user, date__year=current_year, date__month=current_month
+    def post(self, request):
+        archive = request.FILES.get("archive")
+        if archive is None:
+            return Response(
+                {"archive": "A backup file is required."},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .values("category")
-            .annotate(total=Sum("amount"))
-        )
+        try:
+            counts = restore_backup(request.user, archive)
+        except BackupError as error:
+            return Response({"archive": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"restored": counts})
 
-        # Convert QuerySet to dictionary
-        current_expenses_dict = {
-            item["category"]: item["total"] for item in current_month_expenses
-        }
 
-        # Fetch last month expenses by category
-        last_month_expenses = (
-            Expense.objects.filter(
-                user=request.user, date__year=last_year, date__month=last_month
-            )
-            .values("category")
-            .annotate(total=Sum("amount"))
+class DashboardEventsTicketView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # EventSource cannot set headers, so browsers open the stream with a
+        # short-lived ticket instead of the API token
+        return Response(
+            {
+                "ticket": issue_ticket(request.user),
+                "expires_in": settings.EVENTS_TICKET_SECONDS,
+            }
         )
 
-        # Convert QuerySet to dictionary
-        last_expenses_dict = {
-            item["category"]: item["total"] for item in last_month_expenses
-        }
 
-        # Calculate percentage change by category
-        categorized_expenses = []
-        for category in CATEGORIES:
-            current_total = current_expenses_dict.get(category, 0)
-            last_total = last_expenses_dict.get(category, 0)
-            percentage_change = (
-                ((current_total - last_total) / last_total) * 100
-                if last_total > 0
-                else (100 if current_total > 0 else 0)
+class DashboardEventsView(View):
+    """
+    Server-Sent Events stream of dashboard changes, served by the ASGI
+    application: new transactions, account balances and category totals.
+    Idle streams only hold a queue on the event loop, no thread.
+
+    Clients authenticate with an ``Authorization: Token`` header or a
+    ``?ticket=`` from DashboardEventsTicketView, and fetch a new ticket when
+    reconnecting after it expired.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {"detail": "Events are only served by the ASGI application."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
             )
-            categorized_expenses.append(
-                {
-                    "category": category,
-                    "current_month_total": current_total,
-                    "last_month_total": last_total,
-                    "percentage_change": round(percentage_change, 2),
-                }
+        key = request.headers.get("Authorization", "").removeprefix("Token ")
+        if key.strip():
+            authenticate, credentials = token_user, key.strip()
+        else:
+            authenticate, credentials = ticket_user, request.GET.get("ticket", "")
+        user = await sync_to_async(authenticate, thread_sensitive=False)(credentials)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Invalid token or ticket."},
+                status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        # Response
-        response_data = {
-            "user": user.username,
-            "date": current_date.strftime("%d-%m-%Y"),
-            "total_balance": total_balance["balance__sum"],
-            "accounts": accounts_serializer.data,
-            "main_goal": main_goal_serializer.data,
-            "recent_transactions": transactions_serializer.data,
-            "monthly_goals": monthly_goals_data,
-            "monthly_expenses": monthly_expenses_data,
-            "categorized_expenses": categorized_expenses,
-        }
+        subscription = get_broker().subscribe(user.pk)
+        response = StreamingHttpResponse(
+            event_stream(subscription), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
 
-        return Response(response_data)
+
+class BatchAPIView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    batchable = False
+
+    @swagger_auto_schema(request_body=BatchSerializer)
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if serializer.is_valid():
+            # One authentication and throttle check for all the sub-requests
+            responses = [
+                dispatch_batched(request, **sub_request)
+                for sub_request in serializer.validated_data["requests"]
+            ]
+            return Response({"responses": responses})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DatabasePoolView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Metrics of the in-process connection pools of this worker
+        return Response(pool_stats())
+
+
+class ProfileArtifactView(APIView):
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+    batchable = False
+
+    def get(self, request, name):
+        # A cProfile dump or SQL report saved by ProfilingMiddleware
+        path = os.path.join(settings.PROFILE_DIR, name)
+        if not ARTIFACT_NAME.fullmatch(name) or not os.path.exists(path):
+            raise Http404
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Share database connections between requests through an in-process pool,
+# set DB_POOL=False to open one connection per request instead
+os.environ.setdefault('DB_POOL', 'True')
 
 application = get_asgi_application()
@@ -1,13 +1,19 @@
 import os
 from pathlib import Path
 
-from dotenv import load_dotenv
-
-load_dotenv()
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Deployed workers get their environment from the process manager, so only
+# import python-dotenv when there is a .env file to read
+DOTENV_PATH = os.getenv("DOTENV_PATH", BASE_DIR / ".env")
+if os.path.exists(DOTENV_PATH):
+    from dotenv import load_dotenv
+
+    load_dotenv(DOTENV_PATH)
+
 # Quick-start development settings - unsuitable for production
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -26,7 +32,6 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     # third-party apps
-    "drf_yasg",
     "corsheaders",
     "rest_framework",
     "rest_framework.authtoken",
@@ -34,6 +39,20 @@ INSTALLED_APPS = [
     "api.apps.ApiConfig",
 ]
 
+# Interactive Swagger docs (drf_yasg), on by default with DEBUG. The schema
+# itself is built once with build_api_schema and served from
+# API_SCHEMA_PATH at /openapi.json, so production workers skip drf_yasg.
+API_DOCS = (
+    os.getenv("API_DOCS", "True" if os.getenv("DEBUG") == "True" else "False")
+    == "True"
+)
+API_SCHEMA_PATH = os.getenv(
+    "API_SCHEMA_PATH", os.path.join(BASE_DIR, "openapi.json")
+)
+API_SCHEMA_MAX_AGE = int(os.getenv("API_SCHEMA_MAX_AGE", 24 * 60 * 60))
+if API_DOCS:
+    INSTALLED_APPS.insert(INSTALLED_APPS.index("corsheaders"), "drf_yasg")
+
 SWAGGER_SETTINGS = {
     "SECURITY_DEFINITIONS": {
         "Token": {"type": "apiKey", "name": "Authorization", "in": "header"}
@@ -55,12 +74,24 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # orjson-backed JSON when installed (it is in requirements.txt but
+    # optional), stdlib json otherwise, with the same output either way
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
         "MAX_PAGE_SIZE": 100,
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.UserRateThrottle",
-        "rest_framework.throttling.AnonRateThrottle",
+        "api.throttling.BurstRateThrottle",
+        "api.throttling.UserRateThrottle",
+        "api.throttling.AnonRateThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "10/minute",  # anonymous user
@@ -110,9 +141,143 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        # Keep connections open between requests, checking them before reuse
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
     }
 }
 
+# Read replicas, as a comma-separated list of host[:port] entries
+# (file paths for SQLite) sharing the credentials of the primary
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv("DB_REPLICAS", "").split(","))):
+    alias = f"replica_{index + 1}"
+    DATABASES[alias] = dict(DATABASES["default"], TEST={"MIRROR": "default"})
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+        DATABASES[alias]["NAME"] = replica
+    else:
+        host, _, port = replica.partition(":")
+        DATABASES[alias].update(HOST=host, PORT=port or DATABASES["default"]["PORT"])
+    DATABASE_REPLICAS.append(alias)
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+    MIDDLEWARE.insert(1, "api.middleware.ReplicaRoutingMiddleware")
+
+# Development aid logging statements a request runs QUERY_INSPECTION_THRESHOLD
+# times or more, the usual sign of a query per row
+QUERY_INSPECTION = os.getenv("QUERY_INSPECTION") == "True"
+QUERY_INSPECTION_THRESHOLD = int(os.getenv("QUERY_INSPECTION_THRESHOLD", 5))
+if QUERY_INSPECTION:
+    MIDDLEWARE.insert(1, "api.middleware.QueryInspectionMiddleware")
+
+# Opt in to let staff profile a request with an X-Profile header or ?profile,
+# the cProfile and SQL report are saved in PROFILE_DIR, keeping the latest
+# PROFILE_KEEP requests
+PROFILING = os.getenv("PROFILING") == "True"
+PROFILE_DIR = os.getenv("PROFILE_DIR", BASE_DIR / "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 20))
+if PROFILING:
+    MIDDLEWARE.insert(1, "api.middleware.ProfilingMiddleware")
+
+# In-process connection pool, enabled by backend/asgi.py. Persistent
+# connections belong to a thread, and ASGI does not reuse threads the way
+# WSGI workers do, so connections are returned to a shared pool instead.
+DB_POOL_ENGINE = DATABASES["default"]["ENGINE"]
+if os.getenv("DB_POOL") == "True":
+    for database in DATABASES.values():
+        database.update(
+            ENGINE="api.db.pooled",
+            CONN_MAX_AGE=0,
+            POOL={
+                "SIZE": int(os.getenv("DB_POOL_SIZE", 10)),
+                "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+                "MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+            },
+        )
+
+# Cache shared by all workers (throttling, replica pinning), for example
+# redis://localhost:6379/0. Without it each process keeps its own cache.
+if os.getenv("CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_URL"),
+        }
+    }
+
+# Password hashing. PBKDF2 work factor is configurable, existing hashes are
+# upgraded on login. Hashing runs on PASSWORD_HASHING_WORKERS threads
+# (default: one per CPU, 0 to hash inline) with up to
+# PASSWORD_HASHING_QUEUE_SIZE requests waiting; more are answered with 503.
+PASSWORD_HASHERS = [
+    "api.hashing.ConfigurablePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 600000))
+PASSWORD_HASHING_WORKERS = (
+    int(os.getenv("PASSWORD_HASHING_WORKERS"))
+    if os.getenv("PASSWORD_HASHING_WORKERS")
+    else None
+)
+PASSWORD_HASHING_QUEUE_SIZE = int(os.getenv("PASSWORD_HASHING_QUEUE_SIZE", 32))
+PASSWORD_HASHING_TIMEOUT = float(os.getenv("PASSWORD_HASHING_TIMEOUT", 10))
+
+# Spending anomalies: expenses more than ANOMALY_THRESHOLD deviations above
+# the exponentially weighted mean (smoothing ANOMALY_EWMA_ALPHA) of their
+# category, once it has ANOMALY_MIN_OBSERVATIONS expenses
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", 0.1))
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", 3))
+ANOMALY_MIN_OBSERVATIONS = int(os.getenv("ANOMALY_MIN_OBSERVATIONS", 5))
+ANOMALY_MIN_DEVIATION = float(os.getenv("ANOMALY_MIN_DEVIATION", 0.05))
+
+# Exchange rates are stored as the value of one unit in
+# FX_REFERENCE_CURRENCY and cached by each process for FX_RATES_CACHE_SECONDS
+FX_REFERENCE_CURRENCY = os.getenv("FX_REFERENCE_CURRENCY", "UZS")
+FX_RATES_CACHE_SECONDS = int(os.getenv("FX_RATES_CACHE_SECONDS", 300))
+
+# Transactions and expenses older than this move to archive tables with the
+# archive_records command, keeping the main tables and their indexes small
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 3 * 365))
+
+# Admin changelists of tables with more rows than this show PostgreSQL's
+# row estimate instead of running COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(
+    os.getenv("ADMIN_ESTIMATED_COUNT_THRESHOLD", 100000)
+)
+
+# Goal forecasts: months of history fitted, and seconds a user's forecast
+# is cached
+FORECAST_HISTORY_MONTHS = int(os.getenv("FORECAST_HISTORY_MONTHS", 60))
+FORECAST_CACHE_SECONDS = int(os.getenv("FORECAST_CACHE_SECONDS", 600))
+
+# Dashboard events (Server-Sent Events, ASGI only): the pub/sub backend,
+# events queued per client before it is told to refetch, seconds between
+# heartbeats, seconds before a stream ends and the client reconnects, and
+# seconds a stream ticket can be used to connect
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "api.events.InProcessBroker")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_STREAM_SECONDS = float(os.getenv("EVENTS_STREAM_SECONDS", 300))
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", 60))
+
+# Most GET sub-requests accepted by a single batch request
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", 10))
+
+# Seconds a cold worker may take to load the application and URLconf,
+# checked by the profile_startup command
+STARTUP_TIME_BUDGET = float(os.getenv("STARTUP_TIME_BUDGET", 1.5))
+
+# Peak bytes a list or dashboard request may use per row of the user's data,
+# checked by benchmark_memory and the test suite
+MEMORY_BYTES_PER_ROW_BUDGET = float(os.getenv("MEMORY_BYTES_PER_ROW_BUDGET", 1500))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -169,12 +334,32 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Stream uploads to temporary files instead of buffering them in memory
+FILE_UPLOAD_HANDLERS = ["django.core.files.uploadhandler.TemporaryFileUploadHandler"]
+
+# Threads resizing uploaded profile photos, 0 to resize during the request
+IMAGE_PROCESSING_WORKERS = int(os.getenv("IMAGE_PROCESSING_WORKERS", 1))
+
+# Deleted accounts: threads purging them, 0 to purge during the request,
+# and rows deleted per statement
+PURGE_WORKERS = int(os.getenv("PURGE_WORKERS", 1))
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 1000))
+
+# Rows per frame of a backup archive, read and inserted at once
+BACKUP_BATCH_SIZE = int(os.getenv("BACKUP_BATCH_SIZE", 5000))
+
+# Seconds an Idempotency-Key replays its response, expire_idempotency_keys
+# deletes older records
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
 # CORS settings for development
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS").split(
     ","
 )  # Allows only this origin to send requests
 CORS_ALLOW_CREDENTIALS = True  # Allows cookies to be sent
 CORS_ALLOW_ALL_ORIGINS = False  # Disallow all origins
+CORS_ALLOW_HEADERS = [*default_headers, "idempotency-key"]
+CORS_EXPOSE_HEADERS = ["idempotent-replayed"]
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -1,32 +1,29 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.conf.urls.static import static
 from django.conf import settings
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="SpendSMART API",
-        default_version="v1",
-        description="SpendSMART API documentation",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
-
+from api.docs import StaticSchemaView
 
 urlpatterns = [
-    path(
-        "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
-        name="schema-swagger-ui",
-    ),
+    path("openapi.json", StaticSchemaView.as_view(), name="openapi-schema"),
     path("admin/", admin.site.urls),
     path("api/v1/", include("api.urls")),
 ]
 
+# drf_yasg is only imported when the interactive docs are enabled
+if settings.API_DOCS:
+    from api.docs import get_schema_view
+
+    schema_view = get_schema_view()
+    urlpatterns.append(
+        path(
+            "swagger/",
+            schema_view.with_ui("swagger", cache_timeout=settings.API_SCHEMA_MAX_AGE),
+            name="schema-swagger-ui",
+        )
+    )
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)